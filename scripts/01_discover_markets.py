@@ -4,12 +4,14 @@ Fetches all active markets from Polymarket's Gamma API with pagination.
 Captures market metadata including token IDs needed for CLOB API calls.
 """
 
-import json
 import os
 import sys
 import logging
+from dataclasses import dataclass
 from datetime import datetime, timezone
+from typing import Any, Optional
 from api_client import PolymarketClient
+from json_io import loads, write_jsonl
 
 # Configure logging
 logging.basicConfig(
@@ -19,8 +21,79 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Constants
-OUTPUT_FILE = "data/markets_snapshot.json"
+OUTPUT_FILE = "data/markets_snapshot.jsonl"
 PAGE_SIZE = 100  # Gamma API max per request
+MAX_WORKERS = 8  # Pages requested concurrently
+
+# Fields the Gamma API may return as JSON-encoded strings instead of arrays
+JSON_STRING_FIELDS = ('clobTokenIds', 'tokens', 'outcomes', 'tags')
+
+# Token outcome labels as the API spells them, mapped to 'yes' / 'no'
+OUTCOME_KINDS = dict.fromkeys(('yes', 'Yes', 'YES'), 'yes')
+OUTCOME_KINDS.update(dict.fromkeys(('no', 'No', 'NO'), 'no'))
+
+
+@dataclass(slots=True)
+class MarketRecord:
+    """
+    Market metadata captured in the snapshot.
+    
+    Field order matches the keys written to markets_snapshot.jsonl.
+    """
+    question: Optional[str]
+    market_id: Optional[str]
+    outcomes: list
+    yes_token_id: Optional[str]
+    no_token_id: Optional[str]
+    ending_time: Optional[str]
+    end_date_iso: Optional[str]
+    category: str
+    tags: list
+    state: str
+    closed: bool
+    volume: Any
+    liquidity: Any
+    url: str
+    data_updated_at: str
+
+
+def decode_json_fields(market: dict):
+    """
+    Decode list fields that the Gamma API sends as JSON-encoded strings.
+    
+    Each field in JSON_STRING_FIELDS is decoded once and stored back on the
+    market dict, so later lookups see plain lists. Values that fail to
+    decode are replaced with an empty list.
+    
+    Args:
+        market: Market dictionary from API (modified in place)
+    """
+    for field in JSON_STRING_FIELDS:
+        value = market.get(field)
+        if isinstance(value, str):
+            try:
+                market[field] = loads(value)
+            except ValueError:
+                logger.debug(f"Failed to parse {field} as JSON: {value[:100]}")
+                market[field] = []
+
+
+def is_valid_token_id(token_id) -> bool:
+    """
+    Check that a token ID looks real rather than garbage like "[" or '"'.
+    
+    Real CLOB token IDs are long numeric strings, so the common string case
+    is checked without a str() conversion.
+    
+    Args:
+        token_id: Token ID value from the API
+        
+    Returns:
+        True if the token ID is longer than 10 characters
+    """
+    if isinstance(token_id, str):
+        return len(token_id) > 10
+    return bool(token_id) and len(str(token_id)) > 10
 
 
 def extract_token_ids(market: dict) -> tuple:
@@ -31,6 +104,8 @@ def extract_token_ids(market: dict) -> tuple:
     - clobTokenIds: Array of token IDs [yes_token_id, no_token_id]
     - tokens: Array of token objects with 'token_id' and 'outcome'
     
+    Both fields are expected to be decoded already (see decode_json_fields).
+    
     Args:
         market: Market dictionary from API
         
@@ -43,20 +118,12 @@ def extract_token_ids(market: dict) -> tuple:
     # Try clobTokenIds first (array format)
     clob_token_ids = market.get('clobTokenIds', [])
     
-    # Check if clobTokenIds is a JSON string and parse it
-    if isinstance(clob_token_ids, str):
-        try:
-            clob_token_ids = json.loads(clob_token_ids)
-        except json.JSONDecodeError:
-            logger.debug(f"Failed to parse clobTokenIds as JSON: {clob_token_ids[:100]}")
-            clob_token_ids = []
-    
     if clob_token_ids and len(clob_token_ids) >= 2:
         yes_token_id = clob_token_ids[0]
         no_token_id = clob_token_ids[1]
         
         # Validate token IDs are not garbage (should be long strings)
-        if yes_token_id and len(str(yes_token_id)) > 10 and no_token_id and len(str(no_token_id)) > 10:
+        if is_valid_token_id(yes_token_id) and is_valid_token_id(no_token_id):
             return yes_token_id, no_token_id
         else:
             # Invalid token IDs, reset and try tokens field
@@ -66,26 +133,75 @@ def extract_token_ids(market: dict) -> tuple:
     # Try tokens array (object format with outcome field)
     tokens = market.get('tokens', [])
     
-    # Check if tokens is a JSON string and parse it
-    if isinstance(tokens, str):
-        try:
-            tokens = json.loads(tokens)
-        except json.JSONDecodeError:
-            logger.debug(f"Failed to parse tokens as JSON: {tokens[:100]}")
-            tokens = []
-    
     for token in tokens:
-        outcome = token.get('outcome', '').lower()
+        # Common spellings hit the table directly; only unusual casing pays for lower()
+        outcome = token.get('outcome', '')
+        kind = OUTCOME_KINDS.get(outcome)
+        if kind is None and isinstance(outcome, str):
+            kind = OUTCOME_KINDS.get(outcome.lower())
         token_id = token.get('token_id') or token.get('tokenId')
         
-        if outcome == 'yes' and token_id and len(str(token_id)) > 10:
+        if kind == 'yes' and is_valid_token_id(token_id):
             yes_token_id = token_id
-        elif outcome == 'no' and token_id and len(str(token_id)) > 10:
+        elif kind == 'no' and is_valid_token_id(token_id):
             no_token_id = token_id
     
     return yes_token_id, no_token_id
 
 
+def build_market_record(market: dict, snapshot_ts: str) -> MarketRecord:
+    """
+    Build a snapshot record from a Gamma API market.
+    
+    Args:
+        market: Market dictionary from API
+        snapshot_ts: ISO timestamp shared by every record in the snapshot
+        
+    Returns:
+        MarketRecord with the captured metadata
+    """
+    decode_json_fields(market)
+    get = market.get
+    
+    # Extract token IDs
+    yes_token_id, no_token_id = extract_token_ids(market)
+    
+    outcomes = get('outcomes', [])
+    tags = get('tags', [])
+    
+    # Resolve fallback fields once
+    market_id = get('id')
+    if market_id is None:
+        market_id = get('conditionId')
+    
+    end_date_iso = get('end_date_iso')
+    ending_time = end_date_iso
+    if ending_time is None:
+        ending_time = get('endDate')
+    if ending_time is None:
+        ending_time = get('ending_time')
+    
+    closed = get('closed', False)
+    
+    return MarketRecord(
+        question=get('question'),
+        market_id=market_id,
+        outcomes=outcomes,
+        yes_token_id=yes_token_id,
+        no_token_id=no_token_id,
+        ending_time=ending_time,
+        end_date_iso=end_date_iso,
+        category=get('category', 'unknown'),
+        tags=tags,
+        state='closed' if closed else 'active',
+        closed=closed,
+        volume=get('volume'),
+        liquidity=get('liquidity'),
+        url=f"https://polymarket.com/event/{get('slug', get('id', ''))}",
+        data_updated_at=snapshot_ts,
+    )
+
+
 def fetch_all_markets(client: PolymarketClient, active_only: bool = True) -> list:
     """
     Fetch all markets from the Polymarket Gamma API with pagination.
@@ -95,88 +211,27 @@ def fetch_all_markets(client: PolymarketClient, active_only: bool = True) -> lis
         active_only: If True, filter only active markets (default: True)
         
     Returns:
-        List of market dictionaries with captured metadata
+        List of MarketRecord instances with captured metadata
     """
-    all_markets = []
-    offset = 0
-    page_num = 1
+    # One timestamp for the whole snapshot
+    snapshot_ts = datetime.now(timezone.utc).isoformat()
     
     logger.info("🔍 Starting market discovery from Polymarket Gamma API...")
     
-    while True:
-        logger.info(f"Fetching page {page_num} (offset={offset}, limit={PAGE_SIZE})...")
-        
-        # Fetch a page of markets
-        markets_page = client.get_markets(limit=PAGE_SIZE, offset=offset, closed=False if active_only else None)
-        
-        if not markets_page:
-            logger.info("No more markets returned. Pagination complete.")
-            break
-        
-        logger.info(f"  Retrieved {len(markets_page)} markets on page {page_num}")
-        
-        # Process each market and extract relevant data
-        for market in markets_page:
-            # Extract token IDs
-            yes_token_id, no_token_id = extract_token_ids(market)
-            
-            # Parse outcomes if it's a JSON string
-            outcomes = market.get('outcomes', [])
-            if isinstance(outcomes, str):
-                try:
-                    outcomes = json.loads(outcomes)
-                except json.JSONDecodeError:
-                    logger.debug(f"Failed to parse outcomes as JSON: {outcomes[:100]}")
-                    outcomes = []
-            
-            # Parse tags if it's a JSON string
-            tags = market.get('tags', [])
-            if isinstance(tags, str):
-                try:
-                    tags = json.loads(tags)
-                except json.JSONDecodeError:
-                    logger.debug(f"Failed to parse tags as JSON: {tags[:100]}")
-                    tags = []
-            
-            # Build market data structure
-            market_data = {
-                'question': market.get('question'),
-                'market_id': market.get('id') if market.get('id') is not None else market.get('conditionId'),
-                'outcomes': outcomes,
-                'yes_token_id': yes_token_id,
-                'no_token_id': no_token_id,
-                'ending_time': (market.get('end_date_iso') if market.get('end_date_iso') is not None 
-                               else market.get('endDate') if market.get('endDate') is not None 
-                               else market.get('ending_time')),
-                'end_date_iso': market.get('end_date_iso'),
-                'category': market.get('category', 'unknown'),
-                'tags': tags,
-                'state': 'closed' if market.get('closed', False) else 'active',
-                'closed': market.get('closed', False),
-                'volume': market.get('volume'),
-                'liquidity': market.get('liquidity'),
-                'url': f"https://polymarket.com/event/{market.get('slug', market.get('id', ''))}",
-                'data_updated_at': datetime.now(timezone.utc).isoformat(),
-            }
-            
-            # Filter by state if active_only is True
-            if active_only:
-                # Check if market is active (not closed)
-                is_closed = market.get('closed', False)
-                if not is_closed:
-                    all_markets.append(market_data)
-            else:
-                all_markets.append(market_data)
-        
-        # Check if we should continue pagination
-        if len(markets_page) < PAGE_SIZE:
-            # Received fewer markets than requested, we've reached the end
-            logger.info("Received fewer markets than page size. Reached end of results.")
-            break
-        
-        # Move to next page
-        offset += PAGE_SIZE
-        page_num += 1
+    # Filter server-side so closed and archived markets are never sent
+    filters = {'closed': False, 'active': True, 'archived': False} if active_only else {}
+    
+    # Pages are requested concurrently; the client stops at the first short page
+    markets_data = client.get_all_markets(page_size=PAGE_SIZE, max_workers=MAX_WORKERS, **filters)
+    logger.info(f"  Retrieved {len(markets_data)} markets")
+    
+    # The server filter should already have dropped closed markets; the check
+    # stays as a cheap safeguard
+    all_markets = [
+        build_market_record(market, snapshot_ts)
+        for market in markets_data
+        if not (active_only and market.get('closed', False))
+    ]
     
     logger.info(f"✅ Market discovery complete!")
     logger.info(f"  Total markets fetched: {len(all_markets)}")
@@ -186,18 +241,17 @@ def fetch_all_markets(client: PolymarketClient, active_only: bool = True) -> lis
 
 def save_markets_to_file(markets: list):
     """
-    Save market metadata to a JSON file.
+    Save market metadata to a newline-delimited JSON file, one market per line.
     
     Args:
-        markets: List of market dictionaries
+        markets: List of MarketRecord instances
     """
     os.makedirs(os.path.dirname(OUTPUT_FILE), exist_ok=True)
     
     logger.info(f"📂 Saving {len(markets)} markets to {OUTPUT_FILE}...")
     
     try:
-        with open(OUTPUT_FILE, 'w') as f:
-            json.dump(markets, f, indent=4)
+        write_jsonl(OUTPUT_FILE, markets)
         logger.info("✅ Market data saved successfully!")
     except IOError as e:
         logger.error(f"❌ Error saving to file: {e}")
@@ -209,11 +263,10 @@ def main():
     Main function to fetch and save active markets data.
     """
     try:
-        # Initialize API client
-        client = PolymarketClient(rate_limit_delay=0.5)
-        
-        # Fetch all active markets with pagination
-        markets = fetch_all_markets(client, active_only=True)
+        # Fetch all active markets with pagination; the client's connections
+        # are released as soon as discovery is done
+        with PolymarketClient(rate_limit_delay=0.5) as client:
+            markets = fetch_all_markets(client, active_only=True)
         
         if markets:
             # Save to file
@@ -222,11 +275,11 @@ def main():
             # Display sample markets
             logger.info("\n📊 Sample markets (first 5):")
             for i, market in enumerate(markets[:5], 1):
-                logger.info(f"{i}. {market['question']}")
-                logger.info(f"   Market ID: {market['market_id']}")
-                logger.info(f"   YES Token: {market['yes_token_id']}")
-                logger.info(f"   NO Token: {market['no_token_id']}")
-                logger.info(f"   Ends: {market['ending_time']}")
+                logger.info(f"{i}. {market.question}")
+                logger.info(f"   Market ID: {market.market_id}")
+                logger.info(f"   YES Token: {market.yes_token_id}")
+                logger.info(f"   NO Token: {market.no_token_id}")
+                logger.info(f"   Ends: {market.ending_time}")
                 logger.info("")
         else:
             logger.warning("❌ No active markets found.")
@@ -4,13 +4,18 @@ Fetches current orderbook data for markets using the CLOB API.
 Reads market data from Script 01's output and calculates bid/ask/mid/spread.
 """
 
-import json
 import os
 import sys
 import logging
 import argparse
+import asyncio
 from datetime import datetime, timezone
-from api_client import PolymarketClient
+from types import MappingProxyType
+from typing import Optional
+import pyarrow as pa
+import pyarrow.parquet as pq
+from api_client import AsyncPolymarketClient
+from json_io import read_jsonl_fields
 
 # Configure logging
 logging.basicConfig(
@@ -20,14 +25,48 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Constants
-INPUT_FILE = "data/markets_snapshot.json"
-OUTPUT_FILE = "data/live_prices.json"
+INPUT_FILE = "data/markets_snapshot.jsonl"
+OUTPUT_FILE = "data/live_prices.parquet"
+MAX_CONCURRENCY = 20  # Orderbook requests in flight at once
+
+# Snapshot fields read by filter_markets and collect_live_prices
+MARKET_FIELDS = (
+    'market_id', 'question', 'yes_token_id', 'no_token_id',
+    'state', 'closed', 'ending_time', 'end_date_iso', 'liquidity',
+)
+
+# Column layout of the live prices Parquet file
+LIVE_PRICES_SCHEMA = pa.schema([
+    ('market_id', pa.string()),
+    ('question', pa.string()),
+    ('yes_token_id', pa.string()),
+    ('no_token_id', pa.string()),
+    ('timestamp', pa.string()),
+    ('yes_best_bid', pa.float64()),
+    ('yes_best_ask', pa.float64()),
+    ('yes_mid_price', pa.float64()),
+    ('yes_spread', pa.float64()),
+    ('no_best_bid', pa.float64()),
+    ('no_best_ask', pa.float64()),
+    ('no_mid_price', pa.float64()),
+    ('no_spread', pa.float64()),
+])
+
+# Shared read-only result for missing or empty orderbooks
+EMPTY_PRICES = MappingProxyType({
+    'best_bid': None,
+    'best_ask': None,
+    'mid_price': None,
+    'spread': None
+})
 
 
 def load_markets():
     """
     Load market data from Script 01's output.
     
+    Only the fields in MARKET_FIELDS are kept for each market.
+    
     Returns:
         List of market dictionaries
     """
@@ -37,8 +76,7 @@ def load_markets():
         sys.exit(1)
     
     try:
-        with open(INPUT_FILE, 'r') as f:
-            markets = json.load(f)
+        markets = read_jsonl_fields(INPUT_FILE, MARKET_FIELDS)
         logger.info(f"✅ Loaded {len(markets)} markets from {INPUT_FILE}")
         return markets
     except Exception as e:
@@ -70,17 +108,22 @@ def filter_markets(markets: list) -> tuple:
         'no_liquidity': 0
     }
     
+    # Reference time for the "already ended" check, taken once for the batch
+    now = datetime.now(timezone.utc)
+    now_iso = now.strftime('%Y-%m-%dT%H:%M:%S')
+    
     for market in markets:
+        get = market.get
+        
         # Check 1: Not closed
-        state = market.get('state', '').lower()
-        closed = market.get('closed', False)
-        if state == 'closed' or closed:
+        state = get('state')
+        if get('closed', False) or (state and state.lower() == 'closed'):
             skip_counts['closed'] += 1
             continue
         
         # Check 2: Has valid token IDs
-        yes_token_id = market.get('yes_token_id')
-        no_token_id = market.get('no_token_id')
+        yes_token_id = get('yes_token_id')
+        no_token_id = get('no_token_id')
         if not yes_token_id or not no_token_id:
             skip_counts['no_token_ids'] += 1
             continue
@@ -88,31 +131,42 @@ def filter_markets(markets: list) -> tuple:
         # Check 3: Token IDs are valid-looking (not garbage like "[" or '"')
         # Real Polymarket token IDs are long numeric strings (70+ characters)
         # Reject garbage values like "[", '"', or other short strings
-        if len(str(yes_token_id)) < 10 or len(str(no_token_id)) < 10:
+        if not isinstance(yes_token_id, str):
+            yes_token_id = str(yes_token_id)
+        if not isinstance(no_token_id, str):
+            no_token_id = str(no_token_id)
+        if len(yes_token_id) < 10 or len(no_token_id) < 10:
             skip_counts['no_token_ids'] += 1
             continue
         
         # Check 4: Market hasn't ended yet
-        ending_time = market.get('ending_time') or market.get('end_date_iso')
+        ending_time = get('ending_time') or get('end_date_iso')
         if ending_time:
-            try:
-                # Parse the ISO date string
-                end_dt = datetime.fromisoformat(ending_time.replace('Z', '+00:00'))
-                if end_dt < datetime.now(timezone.utc):
+            # UTC timestamps like "2024-01-31T23:59:59Z" sort lexicographically,
+            # so compare their first 19 characters directly; anything else is parsed
+            if (isinstance(ending_time, str) and len(ending_time) >= 20
+                    and ending_time[10] == 'T' and ending_time[-1] == 'Z'):
+                if ending_time[:19] < now_iso:
                     skip_counts['closed'] += 1  # Count as "closed" since they've ended
                     continue
-            except (ValueError, TypeError):
-                pass  # If we can't parse the date, don't skip
+            else:
+                try:
+                    # Parse the ISO date string
+                    end_dt = datetime.fromisoformat(ending_time.replace('Z', '+00:00'))
+                    if end_dt < now:
+                        skip_counts['closed'] += 1  # Count as "closed" since they've ended
+                        continue
+                except (ValueError, TypeError):
+                    pass  # If we can't parse the date, don't skip
         
         # Check 5: Has liquidity (convert to float to check if it's effectively non-zero)
-        liquidity = market.get('liquidity')
+        liquidity = get('liquidity')
         if not liquidity:
             skip_counts['no_liquidity'] += 1
             continue
         
         try:
-            liq_val = float(liquidity)
-            if liq_val == 0:
+            if float(liquidity) == 0:
                 skip_counts['no_liquidity'] += 1
                 continue
         except (ValueError, TypeError):
@@ -125,16 +179,72 @@ def filter_markets(markets: list) -> tuple:
     return filtered, skip_counts
 
 
-def parse_orderbook(orderbook: dict) -> dict:
+def warn_if_unsorted(side: str, levels: list):
+    """
+    Log a debug message if a book side is not sorted by price.
+    
+    parse_orderbook only reads the two ends of each side, so an unsorted
+    response would give a wrong best bid or ask. Only called when DEBUG
+    logging is enabled.
+    
+    Args:
+        side: 'bids' or 'asks' (for the log message)
+        levels: Price levels from the orderbook
+    """
+    prices = [float(level['price']) for level in levels]
+    if prices != sorted(prices) and prices != sorted(prices, reverse=True):
+        logger.debug("Orderbook %s are not sorted by price; use validate=True to scan every level", side)
+
+
+def scan_best_price(levels: list, pick) -> Optional[float]:
+    """
+    Find the best price on one side of the book by scanning every level.
+    
+    Levels with a missing price are skipped.
+    
+    Args:
+        levels: Price levels from the orderbook
+        pick: max for bids, min for asks
+        
+    Returns:
+        Best price, or None if no level has a price or a price is not numeric
+    """
+    try:
+        # Reduce in one pass without a temporary list
+        return pick(
+            (float(level['price']) for level in levels if level.get('price') is not None),
+            default=None
+        )
+    except (ValueError, TypeError):
+        return None
+
+
+def parse_orderbook(orderbook: dict, validate: bool = False) -> dict:
     """
     Parse orderbook data to extract best bid, best ask, mid price, and spread.
     
+    The CLOB returns each side of the book sorted by price, so the best level
+    sits at one end of the list. Both ends are read, which keeps the lookup
+    O(1) without depending on the direction each side is sorted in.
+    
     Args:
         orderbook: Orderbook dictionary with 'bids' and 'asks'
+        validate: If True, scan every level instead of trusting the sort order
+            (useful for spot-checking the API response)
         
     Returns:
-        Dictionary with best_bid, best_ask, mid_price, spread (or None values if empty)
+        Dictionary with best_bid, best_ask, mid_price, spread (or the shared
+        read-only EMPTY_PRICES mapping if the book is missing or empty)
     """
+    if not orderbook:
+        return EMPTY_PRICES
+    
+    bids = orderbook.get('bids', [])
+    asks = orderbook.get('asks', [])
+    
+    if not bids and not asks:
+        return EMPTY_PRICES
+    
     result = {
         'best_bid': None,
         'best_ask': None,
@@ -142,31 +252,34 @@ def parse_orderbook(orderbook: dict) -> dict:
         'spread': None
     }
     
-    if not orderbook:
-        return result
-    
-    bids = orderbook.get('bids', [])
-    asks = orderbook.get('asks', [])
+    # Spot-check the sort order the fast path relies on, only when debugging
+    check_sorted = not validate and logger.isEnabledFor(logging.DEBUG)
     
     # Get best bid (highest price someone will pay)
     if bids:
-        # Filter out bids with missing or invalid prices
-        try:
-            valid_bids = [float(bid.get('price')) for bid in bids if bid.get('price') is not None]
-            if valid_bids:
-                result['best_bid'] = max(valid_bids)
-        except (ValueError, TypeError):
-            pass
+        if validate:
+            result['best_bid'] = scan_best_price(bids, max)
+        else:
+            try:
+                if check_sorted:
+                    warn_if_unsorted('bids', bids)
+                result['best_bid'] = max(float(bids[0]['price']), float(bids[-1]['price']))
+            except (KeyError, ValueError, TypeError):
+                # An end level is missing or malformed; scan the whole side instead
+                result['best_bid'] = scan_best_price(bids, max)
     
     # Get best ask (lowest price someone will sell)
     if asks:
-        # Filter out asks with missing or invalid prices
-        try:
-            valid_asks = [float(ask.get('price')) for ask in asks if ask.get('price') is not None]
-            if valid_asks:
-                result['best_ask'] = min(valid_asks)
-        except (ValueError, TypeError):
-            pass
+        if validate:
+            result['best_ask'] = scan_best_price(asks, min)
+        else:
+            try:
+                if check_sorted:
+                    warn_if_unsorted('asks', asks)
+                result['best_ask'] = min(float(asks[0]['price']), float(asks[-1]['price']))
+            except (KeyError, ValueError, TypeError):
+                # An end level is missing or malformed; scan the whole side instead
+                result['best_ask'] = scan_best_price(asks, min)
     
     # Calculate mid price and spread
     if result['best_bid'] is not None and result['best_ask'] is not None:
@@ -176,12 +289,30 @@ def parse_orderbook(orderbook: dict) -> dict:
     return result
 
 
-def collect_live_prices(client: PolymarketClient, markets: list) -> list:
+def describe_quote(prices: dict) -> str:
+    """
+    Format parsed orderbook prices for the per-market log line.
+    
+    Args:
+        prices: Dictionary returned by parse_orderbook
+        
+    Returns:
+        Mid price and spread, or a note that the orderbook was empty
+    """
+    if prices['mid_price'] is None:
+        return "No orderbook data"
+    return f"${prices['mid_price']:.4f} (spread: ${prices['spread']:.4f})"
+
+
+async def collect_live_prices(client: AsyncPolymarketClient, markets: list) -> list:
     """
     Collect live prices for all markets using CLOB API.
     
+    Orderbooks for every distinct token are fetched through the CLOB batch
+    endpoint, so a run needs one request per BOOKS_BATCH_SIZE tokens.
+    
     Args:
-        client: PolymarketClient instance
+        client: AsyncPolymarketClient instance
         markets: List of market dictionaries from Script 01
         
     Returns:
@@ -192,29 +323,39 @@ def collect_live_prices(client: PolymarketClient, markets: list) -> list:
     
     logger.info(f"🔍 Collecting live prices for {len(markets)} markets...")
     
-    for i, market in enumerate(markets, 1):
-        market_id = market.get('market_id')
-        question = market.get('question', 'Unknown')
-        yes_token_id = market.get('yes_token_id')
-        no_token_id = market.get('no_token_id')
-        
-        logger.info(f"[{i}/{len(markets)}] {question[:60]}...")
-        
-        # Skip markets without token IDs
-        if not yes_token_id or not no_token_id:
-            logger.warning(f"  ⚠️  Skipping: Missing token IDs")
+    # Skip markets without token IDs
+    priced_markets = []
+    for market in markets:
+        if not market.get('yes_token_id') or not market.get('no_token_id'):
+            logger.warning(f"  ⚠️  Skipping {market.get('question', 'Unknown')[:60]}: Missing token IDs")
             continue
+        priced_markets.append(market)
+    
+    # Fetch each distinct token once, even if several markets share it
+    token_ids = list(dict.fromkeys(
+        token_id
+        for market in priced_markets
+        for token_id in (market['yes_token_id'], market['no_token_id'])
+    ))
+    orderbooks = await client.get_orderbooks(token_ids)
+    
+    # Checked once so per-market log lines cost nothing when INFO is disabled
+    log_markets = logger.isEnabledFor(logging.INFO)
+    total = len(priced_markets)
+    
+    for i, market in enumerate(priced_markets, 1):
+        question = market.get('question', 'Unknown')
+        yes_orderbook = orderbooks.get(market['yes_token_id'])
+        no_orderbook = orderbooks.get(market['no_token_id'])
         
         price_data = {
-            'market_id': market_id,
+            'market_id': market.get('market_id'),
             'question': question,
-            'yes_token_id': yes_token_id,
-            'no_token_id': no_token_id,
+            'yes_token_id': market['yes_token_id'],
+            'no_token_id': market['no_token_id'],
             'timestamp': timestamp
         }
         
-        # Fetch YES token orderbook
-        yes_orderbook = client.get_orderbook(yes_token_id)
         yes_prices = parse_orderbook(yes_orderbook)
         
         price_data['yes_best_bid'] = yes_prices['best_bid']
@@ -222,8 +363,6 @@ def collect_live_prices(client: PolymarketClient, markets: list) -> list:
         price_data['yes_mid_price'] = yes_prices['mid_price']
         price_data['yes_spread'] = yes_prices['spread']
         
-        # Fetch NO token orderbook
-        no_orderbook = client.get_orderbook(no_token_id)
         no_prices = parse_orderbook(no_orderbook)
         
         price_data['no_best_bid'] = no_prices['best_bid']
@@ -233,25 +372,36 @@ def collect_live_prices(client: PolymarketClient, markets: list) -> list:
         
         live_prices.append(price_data)
         
-        # Log summary
-        if yes_prices['mid_price'] is not None:
-            logger.info(f"  YES: ${yes_prices['mid_price']:.4f} (spread: ${yes_prices['spread']:.4f})")
-        else:
-            logger.info(f"  YES: No orderbook data")
-        
-        if no_prices['mid_price'] is not None:
-            logger.info(f"  NO:  ${no_prices['mid_price']:.4f} (spread: ${no_prices['spread']:.4f})")
-        else:
-            logger.info(f"  NO:  No orderbook data")
+        # Log summary, one line per market
+        if log_markets:
+            logger.info("[%d/%d] %.60s | YES: %s | NO: %s",
+                        i, total, question, describe_quote(yes_prices), describe_quote(no_prices))
     
     logger.info(f"✅ Collected live prices for {len(live_prices)} markets")
     
     return live_prices
 
 
+async def run_collection(markets: list) -> list:
+    """
+    Open an async client and collect live prices for the given markets.
+    
+    Args:
+        markets: List of market dictionaries from Script 01
+        
+    Returns:
+        List of live price dictionaries
+    """
+    async with AsyncPolymarketClient(max_concurrency=MAX_CONCURRENCY) as client:
+        return await collect_live_prices(client, markets)
+
+
 def save_live_prices(prices: list):
     """
-    Save live prices to JSON file.
+    Save live prices to a Parquet file.
+    
+    Column names are stored once in the schema and prices stay native
+    doubles, so the file is far smaller than the equivalent JSON.
     
     Args:
         prices: List of price dictionaries
@@ -261,10 +411,10 @@ def save_live_prices(prices: list):
     logger.info(f"📂 Saving live prices to {OUTPUT_FILE}...")
     
     try:
-        with open(OUTPUT_FILE, 'w') as f:
-            json.dump(prices, f, indent=4)
+        table = pa.Table.from_pylist(prices, schema=LIVE_PRICES_SCHEMA)
+        pq.write_table(table, OUTPUT_FILE, compression='zstd')
         logger.info("✅ Live prices saved successfully!")
-    except IOError as e:
+    except (IOError, pa.ArrowException) as e:
         logger.error(f"❌ Error saving to file: {e}")
         sys.exit(1)
 
@@ -311,11 +461,8 @@ def main():
             logger.warning("❌ No markets to process after filtering.")
             sys.exit(1)
         
-        # Initialize API client with reduced rate limit
-        client = PolymarketClient(rate_limit_delay=0.3)
-        
         # Collect live prices
-        live_prices = collect_live_prices(client, markets)
+        live_prices = asyncio.run(run_collection(markets))
         
         if live_prices:
             # Save to file
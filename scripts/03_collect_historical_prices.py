@@ -4,13 +4,17 @@ Fetches historical price data for markets using the CLOB API.
 Reads market data from Script 01's output.
 """
 
-import json
 import os
 import sys
 import logging
 import argparse
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
+from typing import Optional
 from api_client import PolymarketClient
+from json_io import dumps, loads, read_jsonl, write_jsonl
 
 # Configure logging
 logging.basicConfig(
@@ -20,8 +24,81 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Constants
-INPUT_FILE = "data/markets_snapshot.json"
-OUTPUT_FILE = "data/historical_prices.json"
+INPUT_FILE = "data/markets_snapshot.jsonl"
+OUTPUT_FILE = "data/historical_prices.jsonl.zst"
+CACHE_FILE = "data/history_cache.sqlite"
+
+# Price history request parameters
+HISTORY_INTERVAL = "max"
+HISTORY_FIDELITY = 60
+
+# Concurrent price history requests; the client's rate limit still spaces them out
+MAX_WORKERS = 10
+
+
+class HistoryCache:
+    """
+    On-disk cache of price history responses, kept for the current UTC day.
+    
+    Responses are keyed by (token_id, interval, fidelity, date). Full-range
+    histories only grow by appending new points, so a response fetched earlier
+    the same day is close enough to reuse. Entries from earlier days are
+    deleted when the cache is opened. Safe to share between threads.
+    """
+    
+    def __init__(self, path: str = CACHE_FILE):
+        """
+        Open (or create) the cache database.
+        
+        Args:
+            path: SQLite database file path
+        """
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.day = datetime.now(timezone.utc).strftime('%Y-%m-%d')
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS price_history_cache (
+                token_id TEXT NOT NULL,
+                interval TEXT NOT NULL,
+                fidelity INTEGER NOT NULL,
+                day TEXT NOT NULL,
+                response BLOB NOT NULL,
+                PRIMARY KEY (token_id, interval, fidelity, day)
+            )
+        """)
+        self._conn.execute("DELETE FROM price_history_cache WHERE day < ?", (self.day,))
+        self._conn.commit()
+    
+    def get(self, token_id: str, interval: str, fidelity: int) -> Optional[dict]:
+        """
+        Look up today's cached response for a token.
+        
+        Returns:
+            Cached response, or None if there is no entry for today
+        """
+        with self._lock:
+            row = self._conn.execute("""
+                SELECT response FROM price_history_cache
+                WHERE token_id = ? AND interval = ? AND fidelity = ? AND day = ?
+            """, (token_id, interval, fidelity, self.day)).fetchone()
+        return loads(row[0]) if row else None
+    
+    def set(self, token_id: str, interval: str, fidelity: int, response: dict):
+        """
+        Store today's response for a token.
+        """
+        response = dumps(response)
+        with self._lock:
+            self._conn.execute("""
+                INSERT OR REPLACE INTO price_history_cache (token_id, interval, fidelity, day, response)
+                VALUES (?, ?, ?, ?, ?)
+            """, (token_id, interval, fidelity, self.day, response))
+            self._conn.commit()
+    
+    def close(self):
+        """Close the underlying database connection."""
+        self._conn.close()
 
 
 def load_markets():
@@ -37,8 +114,7 @@ def load_markets():
         sys.exit(1)
     
     try:
-        with open(INPUT_FILE, 'r') as f:
-            markets = json.load(f)
+        markets = read_jsonl(INPUT_FILE)
         logger.info(f"✅ Loaded {len(markets)} markets from {INPUT_FILE}")
         return markets
     except Exception as e:
@@ -70,17 +146,22 @@ def filter_markets(markets: list) -> tuple:
         'no_liquidity': 0
     }
     
+    # Reference time for the "already ended" check, taken once for the batch
+    now = datetime.now(timezone.utc)
+    now_iso = now.strftime('%Y-%m-%dT%H:%M:%S')
+    
     for market in markets:
+        get = market.get
+        
         # Check 1: Not closed
-        state = market.get('state', '').lower()
-        closed = market.get('closed', False)
-        if state == 'closed' or closed:
+        state = get('state')
+        if get('closed', False) or (state and state.lower() == 'closed'):
             skip_counts['closed'] += 1
             continue
         
         # Check 2: Has valid token IDs
-        yes_token_id = market.get('yes_token_id')
-        no_token_id = market.get('no_token_id')
+        yes_token_id = get('yes_token_id')
+        no_token_id = get('no_token_id')
         if not yes_token_id or not no_token_id:
             skip_counts['no_token_ids'] += 1
             continue
@@ -88,31 +169,42 @@ def filter_markets(markets: list) -> tuple:
         # Check 3: Token IDs are valid-looking (not garbage like "[" or '"')
         # Real Polymarket token IDs are long numeric strings (70+ characters)
         # Reject garbage values like "[", '"', or other short strings
-        if len(str(yes_token_id)) < 10 or len(str(no_token_id)) < 10:
+        if not isinstance(yes_token_id, str):
+            yes_token_id = str(yes_token_id)
+        if not isinstance(no_token_id, str):
+            no_token_id = str(no_token_id)
+        if len(yes_token_id) < 10 or len(no_token_id) < 10:
             skip_counts['no_token_ids'] += 1
             continue
         
         # Check 4: Market hasn't ended yet
-        ending_time = market.get('ending_time') or market.get('end_date_iso')
+        ending_time = get('ending_time') or get('end_date_iso')
         if ending_time:
-            try:
-                # Parse the ISO date string
-                end_dt = datetime.fromisoformat(ending_time.replace('Z', '+00:00'))
-                if end_dt < datetime.now(timezone.utc):
+            # UTC timestamps like "2024-01-31T23:59:59Z" sort lexicographically,
+            # so compare their first 19 characters directly; anything else is parsed
+            if (isinstance(ending_time, str) and len(ending_time) >= 20
+                    and ending_time[10] == 'T' and ending_time[-1] == 'Z'):
+                if ending_time[:19] < now_iso:
                     skip_counts['closed'] += 1  # Count as "closed" since they've ended
                     continue
-            except (ValueError, TypeError):
-                pass  # If we can't parse the date, don't skip
+            else:
+                try:
+                    # Parse the ISO date string
+                    end_dt = datetime.fromisoformat(ending_time.replace('Z', '+00:00'))
+                    if end_dt < now:
+                        skip_counts['closed'] += 1  # Count as "closed" since they've ended
+                        continue
+                except (ValueError, TypeError):
+                    pass  # If we can't parse the date, don't skip
         
         # Check 5: Has liquidity (convert to float to check if it's effectively non-zero)
-        liquidity = market.get('liquidity')
+        liquidity = get('liquidity')
         if not liquidity:
             skip_counts['no_liquidity'] += 1
             continue
         
         try:
-            liq_val = float(liquidity)
-            if liq_val == 0:
+            if float(liquidity) == 0:
                 skip_counts['no_liquidity'] += 1
                 continue
         except (ValueError, TypeError):
@@ -125,13 +217,63 @@ def filter_markets(markets: list) -> tuple:
     return filtered, skip_counts
 
 
-def collect_historical_prices(client: PolymarketClient, markets: list) -> dict:
+def fetch_price_history(client: PolymarketClient, token_id: str, cache: Optional[HistoryCache] = None):
+    """
+    Fetch a token's price history, serving it from the cache when possible.
+    
+    Only successful responses are cached, so failed requests are retried on
+    the next run.
+    
+    Args:
+        client: PolymarketClient instance
+        token_id: CLOB token ID
+        cache: Optional HistoryCache to read from and write to
+        
+    Returns:
+        Price history response, or None if the request failed
+    """
+    if cache is not None:
+        history = cache.get(token_id, HISTORY_INTERVAL, HISTORY_FIDELITY)
+        if history is not None:
+            return history
+    
+    history = client.get_prices_history(token_id, interval=HISTORY_INTERVAL, fidelity=HISTORY_FIDELITY)
+    
+    if history and cache is not None:
+        cache.set(token_id, HISTORY_INTERVAL, HISTORY_FIDELITY, history)
+    
+    return history
+
+
+def describe_history(history) -> str:
+    """
+    Format a price history response for the per-market log line.
+    
+    Args:
+        history: Response from get_prices_history, or None
+        
+    Returns:
+        Number of data points, or a note that no history was returned
+    """
+    if not history:
+        return "No historical data available"
+    history_data = history.get('history', [])
+    if isinstance(history_data, list):
+        return f"{len(history_data)} historical data points"
+    return "Historical data retrieved"
+
+
+def collect_historical_prices(client: PolymarketClient, markets: list, cache: Optional[HistoryCache] = None) -> dict:
     """
     Collect historical price data for markets using CLOB API.
     
+    Requests run on a thread pool of MAX_WORKERS threads; results are read
+    back in market order, so logging and output order match the input.
+    
     Args:
         client: PolymarketClient instance
         markets: List of market dictionaries from Script 01
+        cache: Optional HistoryCache for responses fetched earlier today
         
     Returns:
         Dictionary mapping market_id to historical price data
@@ -141,58 +283,55 @@ def collect_historical_prices(client: PolymarketClient, markets: list) -> dict:
     
     logger.info(f"🔍 Collecting historical prices for {len(markets)} markets...")
     
-    for i, market in enumerate(markets, 1):
-        market_id = market.get('market_id')
-        question = market.get('question', 'Unknown')
-        yes_token_id = market.get('yes_token_id')
-        no_token_id = market.get('no_token_id')
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        # Queue one request per distinct token up front; markets that share a
+        # token reuse its result. Results are then read back in market order
+        futures = {}
+        for market in markets:
+            yes_token_id = market.get('yes_token_id')
+            no_token_id = market.get('no_token_id')
+            if not yes_token_id or not no_token_id:
+                continue
+            for token_id in (yes_token_id, no_token_id):
+                if token_id not in futures:
+                    futures[token_id] = executor.submit(fetch_price_history, client, token_id, cache)
         
-        logger.info(f"[{i}/{len(markets)}] {question[:60]}...")
+        logger.info(f"  {len(futures)} distinct tokens to fetch")
         
-        # Skip markets without token IDs (should not happen after filtering, but defensive check)
-        if not yes_token_id or not no_token_id:
-            logger.warning(f"  ⚠️  Skipping: Missing token IDs")
-            continue
+        # Checked once so per-market log lines cost nothing when INFO is disabled
+        log_markets = logger.isEnabledFor(logging.INFO)
+        total = len(markets)
         
-        market_history = {
-            'market_id': market_id,
-            'question': question,
-            'yes_token_id': yes_token_id,
-            'no_token_id': no_token_id,
-            'data_collected_at': timestamp,
-            'yes_history': None,
-            'no_history': None
-        }
-        
-        # Fetch YES token price history
-        logger.debug(f"  Fetching YES token history...")
-        yes_history = client.get_prices_history(yes_token_id, interval="max", fidelity=60)
-        if yes_history:
-            market_history['yes_history'] = yes_history
-            # Count data points if available
-            history_data = yes_history.get('history', [])
-            if isinstance(history_data, list):
-                logger.info(f"  YES: {len(history_data)} historical data points")
-            else:
-                logger.info(f"  YES: Historical data retrieved")
-        else:
-            logger.info(f"  YES: No historical data available")
-        
-        # Fetch NO token price history
-        logger.debug(f"  Fetching NO token history...")
-        no_history = client.get_prices_history(no_token_id, interval="max", fidelity=60)
-        if no_history:
-            market_history['no_history'] = no_history
-            # Count data points if available
-            history_data = no_history.get('history', [])
-            if isinstance(history_data, list):
-                logger.info(f"  NO:  {len(history_data)} historical data points")
-            else:
-                logger.info(f"  NO:  Historical data retrieved")
-        else:
-            logger.info(f"  NO:  No historical data available")
-        
-        historical_data[market_id] = market_history
+        for i, market in enumerate(markets, 1):
+            market_id = market.get('market_id')
+            question = market.get('question', 'Unknown')
+            yes_token_id = market.get('yes_token_id')
+            no_token_id = market.get('no_token_id')
+            
+            # Skip markets without token IDs (should not happen after filtering, but defensive check)
+            if not yes_token_id or not no_token_id:
+                logger.warning("[%d/%d] %.60s | Skipping: Missing token IDs", i, total, question)
+                continue
+            
+            yes_history = futures[yes_token_id].result()
+            no_history = futures[no_token_id].result()
+            
+            market_history = {
+                'market_id': market_id,
+                'question': question,
+                'yes_token_id': yes_token_id,
+                'no_token_id': no_token_id,
+                'data_collected_at': timestamp,
+                'yes_history': yes_history or None,
+                'no_history': no_history or None
+            }
+            
+            # Log summary, one line per market
+            if log_markets:
+                logger.info("[%d/%d] %.60s | YES: %s | NO: %s",
+                            i, total, question, describe_history(yes_history), describe_history(no_history))
+            
+            historical_data[market_id] = market_history
     
     logger.info(f"✅ Collected historical data for {len(historical_data)} markets")
     
@@ -201,7 +340,7 @@ def collect_historical_prices(client: PolymarketClient, markets: list) -> dict:
 
 def save_historical_prices(data: dict):
     """
-    Save historical price data to JSON file.
+    Save historical price data to a newline-delimited JSON file, one market per line.
     
     Args:
         data: Dictionary of historical price data
@@ -211,8 +350,7 @@ def save_historical_prices(data: dict):
     logger.info(f"📂 Saving historical prices to {OUTPUT_FILE}...")
     
     try:
-        with open(OUTPUT_FILE, 'w') as f:
-            json.dump(data, f, indent=4)
+        write_jsonl(OUTPUT_FILE, data.values())
         logger.info("✅ Historical prices saved successfully!")
     except IOError as e:
         logger.error(f"❌ Error saving to file: {e}")
@@ -234,6 +372,11 @@ def main():
         default=None,
         help='Limit the number of markets to process (useful for testing)'
     )
+    parser.add_argument(
+        '--no-cache',
+        action='store_true',
+        help="Ignore today's cached price histories and fetch everything again"
+    )
     args = parser.parse_args()
     
     try:
@@ -261,15 +404,19 @@ def main():
             logger.warning("❌ No markets to process after filtering.")
             sys.exit(1)
         
-        # Initialize API client with reduced rate limit
-        client = PolymarketClient(rate_limit_delay=0.3)
-        
         logger.info("\n⚠️  Note: Historical price collection can take a while for many markets.")
         logger.info("The CLOB API may not have historical data for all markets.")
         logger.info("New markets may have limited or no historical data.\n")
         
-        # Collect historical prices
-        historical_data = collect_historical_prices(client, markets)
+        # Collect historical prices with a reduced rate limit, reusing
+        # responses cached earlier today
+        cache = None if args.no_cache else HistoryCache()
+        try:
+            with PolymarketClient(rate_limit_delay=0.3) as client:
+                historical_data = collect_historical_prices(client, markets, cache)
+        finally:
+            if cache is not None:
+                cache.close()
         
         if historical_data:
             # Save to file
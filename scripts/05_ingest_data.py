@@ -1,14 +1,16 @@
 """
 Script 05: Data Ingestion
-Reads JSON output files from Scripts 01-03 and inserts data into DuckDB.
+Reads the output files from Scripts 01-03 and inserts data into DuckDB.
 """
 
 import duckdb
-import json
 import os
 import sys
 import logging
-from datetime import datetime, timezone
+import argparse
+import pyarrow as pa
+import pyarrow.parquet as pq
+from json_io import iter_jsonl
 
 # Configure logging
 logging.basicConfig(
@@ -19,134 +21,163 @@ logger = logging.getLogger(__name__)
 
 # File paths
 DB_PATH = 'data/polymarket_edge.duckdb'
-MARKETS_FILE = 'data/markets_snapshot.json'
-LIVE_PRICES_FILE = 'data/live_prices.json'
-HISTORICAL_PRICES_FILE = 'data/historical_prices.json'
+MARKETS_FILE = 'data/markets_snapshot.jsonl'
+LIVE_PRICES_FILE = 'data/live_prices.parquet'
+HISTORICAL_PRICES_FILE = 'data/historical_prices.jsonl.zst'
 
+# Price history points staged per insert
+HISTORY_BATCH_ROWS = 50_000
 
-def load_json_file(filepath):
+# Secondary indexes on the append-only price tables, as created by
+# 04_setup_database.py. With --bulk they are dropped before ingest and
+# rebuilt afterwards instead of being maintained row by row
+PRICE_INDEXES = {
+    'idx_live_prices_market_id': 'CREATE INDEX idx_live_prices_market_id ON live_prices(market_id)',
+    'idx_live_prices_timestamp': 'CREATE INDEX idx_live_prices_timestamp ON live_prices(timestamp)',
+    'idx_price_history_market_id': 'CREATE INDEX idx_price_history_market_id ON price_history(market_id)',
+    'idx_price_history_timestamp': 'CREATE INDEX idx_price_history_timestamp ON price_history(timestamp)',
+}
+
+# Staging layout for bulk-loading price history. Loosely typed JSON values
+# are staged as strings and cast to the table's column types by DuckDB on insert
+PRICE_HISTORY_STAGE_SCHEMA = pa.schema([
+    ('market_id', pa.string()),
+    ('question', pa.string()),
+    ('yes_token_id', pa.string()),
+    ('no_token_id', pa.string()),
+    ('side', pa.string()),
+    ('price', pa.float64()),
+    ('t', pa.float64()),  # Unix seconds, converted to TIMESTAMP in SQL
+])
+
+
+def load_parquet_file(filepath):
     """
-    Load and parse a JSON file.
+    Load a Parquet file as an Arrow table.
     
     Args:
-        filepath: Path to the JSON file
+        filepath: Path to the Parquet file
         
     Returns:
-        Parsed JSON data or None if file doesn't exist
+        pyarrow.Table or None if file doesn't exist
     """
     if not os.path.exists(filepath):
         logger.warning(f"File not found: {filepath}")
         return None
     
     try:
-        with open(filepath, 'r') as f:
-            data = json.load(f)
+        data = pq.read_table(filepath)
         logger.info(f"✅ Loaded {filepath}")
         return data
-    except json.JSONDecodeError as e:
-        logger.error(f"❌ Error parsing JSON from {filepath}: {e}")
-        return None
-    except IOError as e:
+    except (IOError, pa.ArrowException) as e:
         logger.error(f"❌ Error reading file {filepath}: {e}")
         return None
 
 
-def ingest_markets(conn, markets_data):
+def as_str(value):
+    """Convert a loosely typed JSON value to a string for staging, keeping None."""
+    if value is None or isinstance(value, str):
+        return value
+    return str(value)
+
+
+def ingest_markets(conn, markets_file):
     """
     Ingest market metadata into the markets table.
     Uses upsert logic: update if exists, insert if new.
     
+    The snapshot is read by DuckDB's JSON reader straight into a temporary
+    staging table (no Python-side parsing) and applied with a single
+    INSERT ... ON CONFLICT DO UPDATE.
+    
     Args:
         conn: DuckDB connection
-        markets_data: List of market dictionaries
+        markets_file: Path to the newline-delimited markets snapshot
         
     Returns:
         Tuple of (inserted_count, updated_count)
     """
-    if not markets_data:
+    if not os.path.exists(markets_file):
+        logger.warning(f"File not found: {markets_file}")
+        return 0, 0
+    
+    # Values are read as text and cast to the markets column types on insert;
+    # list fields are kept as JSON text
+    conn.execute("""
+        CREATE OR REPLACE TEMP TABLE markets_stage AS
+        SELECT
+            market_id, question,
+            coalesce(CAST(outcomes AS VARCHAR), '[]') AS outcomes,
+            yes_token_id, no_token_id, ending_time, category,
+            coalesce(CAST(tags AS VARCHAR), '[]') AS tags,
+            state, volume, liquidity, url, data_updated_at,
+            row_number() OVER () AS line
+        FROM read_json(?, format = 'newline_delimited', columns = {
+            market_id: 'VARCHAR', question: 'VARCHAR', outcomes: 'JSON',
+            yes_token_id: 'VARCHAR', no_token_id: 'VARCHAR', ending_time: 'VARCHAR',
+            category: 'VARCHAR', tags: 'JSON', state: 'VARCHAR', volume: 'VARCHAR',
+            liquidity: 'VARCHAR', url: 'VARCHAR', data_updated_at: 'VARCHAR'
+        })
+    """, [markets_file])
+    
+    total_count, missing_count = conn.execute("""
+        SELECT count(*), count(*) FILTER (WHERE coalesce(market_id, '') = '')
+        FROM markets_stage
+    """).fetchone()
+    
+    if not total_count:
         logger.warning("No markets data to ingest")
         return 0, 0
     
-    logger.info(f"📥 Ingesting {len(markets_data)} markets...")
+    logger.info(f"📥 Ingesting {total_count} markets...")
+    if missing_count:
+        logger.warning(f"Skipping {missing_count} markets without market_id")
     
-    inserted_count = 0
-    updated_count = 0
+    # One row per market_id; the last occurrence in the file wins
+    conn.execute("""
+        DELETE FROM markets_stage
+        WHERE coalesce(market_id, '') = ''
+           OR line NOT IN (SELECT max(line) FROM markets_stage GROUP BY market_id)
+    """)
     
-    for market in markets_data:
-        market_id = market.get('market_id')
-        if not market_id:
-            logger.warning("Skipping market without market_id")
-            continue
-        
-        # Check if market already exists
-        existing = conn.execute(
-            "SELECT market_id FROM markets WHERE market_id = ?", 
-            [market_id]
-        ).fetchone()
-        
-        # Convert lists to JSON strings for storage
-        outcomes_json = json.dumps(market.get('outcomes', []))
-        tags_json = json.dumps(market.get('tags', []))
+    try:
+        # Count matches first so the summary can still split inserts from updates
+        updated_count = conn.execute("""
+            SELECT count(*) FROM markets_stage s
+            JOIN markets m ON m.market_id = s.market_id
+        """).fetchone()[0]
         
-        if existing:
-            # Update existing market
-            conn.execute("""
-                UPDATE markets 
-                SET question = ?,
-                    outcomes = ?,
-                    yes_token_id = ?,
-                    no_token_id = ?,
-                    ending_time = ?,
-                    category = ?,
-                    tags = ?,
-                    state = ?,
-                    volume = ?,
-                    liquidity = ?,
-                    url = ?,
-                    data_updated_at = ?
-                WHERE market_id = ?
-            """, [
-                market.get('question'),
-                outcomes_json,
-                market.get('yes_token_id'),
-                market.get('no_token_id'),
-                market.get('ending_time'),
-                market.get('category'),
-                tags_json,
-                market.get('state'),
-                market.get('volume'),
-                market.get('liquidity'),
-                market.get('url'),
-                market.get('data_updated_at'),
-                market_id
-            ])
-            updated_count += 1
-        else:
-            # Insert new market
-            conn.execute("""
-                INSERT INTO markets (
-                    market_id, question, outcomes, yes_token_id, no_token_id,
-                    ending_time, category, tags, state, volume, liquidity,
-                    url, data_updated_at
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            """, [
-                market_id,
-                market.get('question'),
-                outcomes_json,
-                market.get('yes_token_id'),
-                market.get('no_token_id'),
-                market.get('ending_time'),
-                market.get('category'),
-                tags_json,
-                market.get('state'),
-                market.get('volume'),
-                market.get('liquidity'),
-                market.get('url'),
-                market.get('data_updated_at')
-            ])
-            inserted_count += 1
-    
-    conn.commit()
+        # Insert new markets and update existing ones in one statement
+        # (relies on the UNIQUE constraint on markets.market_id)
+        upserted_count = conn.execute("""
+            INSERT INTO markets (
+                market_id, question, outcomes, yes_token_id, no_token_id,
+                ending_time, category, tags, state, volume, liquidity,
+                url, data_updated_at
+            )
+            SELECT
+                market_id, question, outcomes, yes_token_id, no_token_id,
+                ending_time, category, tags, state, volume, liquidity,
+                url, data_updated_at
+            FROM markets_stage
+            ON CONFLICT (market_id) DO UPDATE
+            SET question = excluded.question,
+                outcomes = excluded.outcomes,
+                yes_token_id = excluded.yes_token_id,
+                no_token_id = excluded.no_token_id,
+                ending_time = excluded.ending_time,
+                category = excluded.category,
+                tags = excluded.tags,
+                state = excluded.state,
+                volume = excluded.volume,
+                liquidity = excluded.liquidity,
+                url = excluded.url,
+                data_updated_at = excluded.data_updated_at
+        """).fetchone()[0]
+        inserted_count = upserted_count - updated_count
+    finally:
+        conn.execute("DROP TABLE IF EXISTS markets_stage")
+    
     logger.info(f"  ✅ Markets: {inserted_count} inserted, {updated_count} updated")
     return inserted_count, updated_count
 
@@ -157,9 +188,12 @@ def ingest_live_prices(conn, live_prices_data):
     Each run appends new snapshots (no deletion).
     Deduplicates based on market_id + timestamp.
     
+    The Arrow table read from Parquet is inserted in one statement; snapshots
+    already in the table are excluded with an anti-join.
+    
     Args:
         conn: DuckDB connection
-        live_prices_data: List of price snapshot dictionaries
+        live_prices_data: pyarrow.Table of price snapshots
         
     Returns:
         Number of snapshots inserted
@@ -168,165 +202,179 @@ def ingest_live_prices(conn, live_prices_data):
         logger.warning("No live prices data to ingest")
         return 0
     
-    logger.info(f"📥 Ingesting {len(live_prices_data)} live price snapshots...")
+    logger.info(f"📥 Ingesting {live_prices_data.num_rows} live price snapshots...")
     
-    inserted_count = 0
-    skipped_count = 0
-    
-    for price in live_prices_data:
-        market_id = price.get('market_id')
-        timestamp = price.get('timestamp')
-        
-        if not market_id or not timestamp:
-            logger.warning("Skipping price snapshot without market_id or timestamp")
-            continue
-        
-        # Check if this exact snapshot already exists (deduplication)
-        existing = conn.execute("""
-            SELECT id FROM live_prices 
-            WHERE market_id = ? AND timestamp = ?
-        """, [market_id, timestamp]).fetchone()
-        
-        if existing:
-            skipped_count += 1
-            continue
+    conn.register('live_prices_stage', live_prices_data)
+    try:
+        missing_count = conn.execute("""
+            SELECT count(*) FROM live_prices_stage
+            WHERE coalesce(market_id, '') = '' OR coalesce(timestamp, '') = ''
+        """).fetchone()[0]
+        if missing_count:
+            logger.warning(f"Skipping {missing_count} price snapshots without market_id or timestamp")
         
-        # Insert new price snapshot
-        conn.execute("""
+        # Insert snapshots not already stored (and each one only once)
+        inserted_count = conn.execute("""
             INSERT INTO live_prices (
                 market_id, question, yes_token_id, no_token_id,
                 yes_best_bid, yes_best_ask, yes_mid_price, yes_spread,
                 no_best_bid, no_best_ask, no_mid_price, no_spread,
                 timestamp
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        """, [
-            market_id,
-            price.get('question'),
-            price.get('yes_token_id'),
-            price.get('no_token_id'),
-            price.get('yes_best_bid'),
-            price.get('yes_best_ask'),
-            price.get('yes_mid_price'),
-            price.get('yes_spread'),
-            price.get('no_best_bid'),
-            price.get('no_best_ask'),
-            price.get('no_mid_price'),
-            price.get('no_spread'),
-            timestamp
-        ])
-        inserted_count += 1
-    
-    conn.commit()
+            )
+            SELECT DISTINCT ON (s.market_id, s.timestamp)
+                s.market_id, s.question, s.yes_token_id, s.no_token_id,
+                s.yes_best_bid, s.yes_best_ask, s.yes_mid_price, s.yes_spread,
+                s.no_best_bid, s.no_best_ask, s.no_mid_price, s.no_spread,
+                CAST(s.timestamp AS TIMESTAMP)
+            FROM live_prices_stage s
+            WHERE s.market_id <> '' AND s.timestamp <> ''
+              AND NOT EXISTS (
+                  SELECT 1 FROM live_prices l
+                  WHERE l.market_id = s.market_id
+                    AND l.timestamp = CAST(s.timestamp AS TIMESTAMP)
+              )
+        """).fetchone()[0]
+    finally:
+        conn.unregister('live_prices_stage')
+    
+    skipped_count = live_prices_data.num_rows - missing_count - inserted_count
+    
     logger.info(f"  ✅ Live prices: {inserted_count} inserted, {skipped_count} skipped (duplicates)")
     return inserted_count
 
 
+def insert_history_batch(conn, columns):
+    """
+    Insert one staged batch of price history points.
+    
+    Points already in the table are excluded with an anti-join, and
+    duplicates within the batch are inserted once.
+    
+    Args:
+        conn: DuckDB connection
+        columns: Dictionary of column lists matching PRICE_HISTORY_STAGE_SCHEMA
+        
+    Returns:
+        Number of points inserted
+    """
+    stage = pa.Table.from_pydict(columns, schema=PRICE_HISTORY_STAGE_SCHEMA)
+    
+    conn.register('price_history_stage', stage)
+    try:
+        # Unix seconds become UTC timestamps in one vectorized expression
+        return conn.execute("""
+            INSERT INTO price_history (
+                market_id, question, yes_token_id, no_token_id,
+                side, price, timestamp
+            )
+            SELECT DISTINCT ON (s.market_id, s.side, s.timestamp)
+                s.market_id, s.question, s.yes_token_id, s.no_token_id,
+                s.side, s.price, s.timestamp
+            FROM (
+                SELECT *, make_timestamp(CAST(t * 1000000 AS BIGINT)) AS timestamp
+                FROM price_history_stage
+            ) s
+            WHERE NOT EXISTS (
+                SELECT 1 FROM price_history h
+                WHERE h.market_id = s.market_id
+                  AND h.side = s.side
+                  AND h.timestamp = s.timestamp
+            )
+        """).fetchone()[0]
+    finally:
+        conn.unregister('price_history_stage')
+
+
 def ingest_historical_prices(conn, historical_data):
     """
     Ingest historical price timeseries into the price_history table.
     Flattens the nested structure: each historical data point becomes a row.
     Deduplicates based on market_id + side + timestamp.
     
+    Records are consumed lazily and points are inserted in batches of
+    HISTORY_BATCH_ROWS, so memory use is bounded by the batch size rather
+    than the size of the file.
+    
     Args:
         conn: DuckDB connection
-        historical_data: Dictionary with market_id as keys
+        historical_data: Iterable of per-market history records
         
     Returns:
         Number of historical data points inserted
     """
-    if not historical_data:
-        logger.warning("No historical prices data to ingest")
-        return 0
-    
-    logger.info(f"📥 Ingesting historical prices for {len(historical_data)} markets...")
+    logger.info("📥 Ingesting historical prices...")
     
+    market_count = 0
+    point_count = 0
     inserted_count = 0
-    skipped_count = 0
+    invalid_count = 0
+    
+    # Flatten YES/NO histories into parallel columns
+    columns = {name: [] for name in PRICE_HISTORY_STAGE_SCHEMA.names}
     
-    for market_id, market_history in historical_data.items():
+    for market_history in historical_data:
         if not market_history:
             continue
         
+        market_count += 1
+        market_id = market_history.get('market_id')
         question = market_history.get('question')
         yes_token_id = market_history.get('yes_token_id')
         no_token_id = market_history.get('no_token_id')
         
-        # Process YES history
-        yes_history = market_history.get('yes_history')
-        if yes_history and isinstance(yes_history, dict):
-            history_points = yes_history.get('history', [])
-            if isinstance(history_points, list):
-                for point in history_points:
-                    timestamp_unix = point.get('t')
-                    price = point.get('p')
-                    
-                    if timestamp_unix is None or price is None:
-                        continue
-                    
-                    # Convert Unix timestamp to ISO format
-                    timestamp = datetime.fromtimestamp(timestamp_unix, tz=timezone.utc).isoformat()
-                    
-                    # Check if this data point already exists (deduplication)
-                    existing = conn.execute("""
-                        SELECT id FROM price_history 
-                        WHERE market_id = ? AND side = ? AND timestamp = ?
-                    """, [market_id, 'YES', timestamp]).fetchone()
-                    
-                    if existing:
-                        skipped_count += 1
-                        continue
-                    
-                    # Insert new historical data point
-                    conn.execute("""
-                        INSERT INTO price_history (
-                            market_id, question, yes_token_id, no_token_id,
-                            side, price, timestamp
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """, [
-                        market_id, question, yes_token_id, no_token_id,
-                        'YES', price, timestamp
-                    ])
-                    inserted_count += 1
+        for side, key in (('YES', 'yes_history'), ('NO', 'no_history')):
+            history = market_history.get(key)
+            if not history or not isinstance(history, dict):
+                continue
+            history_points = history.get('history', [])
+            if not isinstance(history_points, list):
+                continue
+            
+            for point in history_points:
+                timestamp_unix = point.get('t')
+                price = point.get('p')
+                
+                if timestamp_unix is None or price is None:
+                    continue
+                
+                # The stage schema is strict float64; coerce per point so one
+                # malformed value (e.g. "0.6" or "abc") can't abort the batch
+                try:
+                    price = float(price)
+                    timestamp_unix = float(timestamp_unix)
+                except (TypeError, ValueError):
+                    invalid_count += 1
+                    continue
+                
+                columns['market_id'].append(as_str(market_id))
+                columns['question'].append(as_str(question))
+                columns['yes_token_id'].append(as_str(yes_token_id))
+                columns['no_token_id'].append(as_str(no_token_id))
+                columns['side'].append(side)
+                columns['price'].append(price)
+                columns['t'].append(timestamp_unix)
         
-        # Process NO history
-        no_history = market_history.get('no_history')
-        if no_history and isinstance(no_history, dict):
-            history_points = no_history.get('history', [])
-            if isinstance(history_points, list):
-                for point in history_points:
-                    timestamp_unix = point.get('t')
-                    price = point.get('p')
-                    
-                    if timestamp_unix is None or price is None:
-                        continue
-                    
-                    # Convert Unix timestamp to ISO format
-                    timestamp = datetime.fromtimestamp(timestamp_unix, tz=timezone.utc).isoformat()
-                    
-                    # Check if this data point already exists (deduplication)
-                    existing = conn.execute("""
-                        SELECT id FROM price_history 
-                        WHERE market_id = ? AND side = ? AND timestamp = ?
-                    """, [market_id, 'NO', timestamp]).fetchone()
-                    
-                    if existing:
-                        skipped_count += 1
-                        continue
-                    
-                    # Insert new historical data point
-                    conn.execute("""
-                        INSERT INTO price_history (
-                            market_id, question, yes_token_id, no_token_id,
-                            side, price, timestamp
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?)
-                    """, [
-                        market_id, question, yes_token_id, no_token_id,
-                        'NO', price, timestamp
-                    ])
-                    inserted_count += 1
-    
-    conn.commit()
-    logger.info(f"  ✅ Price history: {inserted_count} inserted, {skipped_count} skipped (duplicates)")
+        # Flush once the batch is full
+        if len(columns['t']) >= HISTORY_BATCH_ROWS:
+            point_count += len(columns['t'])
+            inserted_count += insert_history_batch(conn, columns)
+            columns = {name: [] for name in PRICE_HISTORY_STAGE_SCHEMA.names}
+    
+    if columns['t']:
+        point_count += len(columns['t'])
+        inserted_count += insert_history_batch(conn, columns)
+    
+    if not market_count:
+        logger.warning("No historical prices data to ingest")
+        return 0
+    
+    skipped_count = point_count - inserted_count
+    
+    if invalid_count:
+        logger.debug(f"Skipped {invalid_count} history points with non-numeric price or timestamp")
+    
+    logger.info(f"  ✅ Price history: {inserted_count} inserted, {skipped_count} skipped (duplicates) "
+                f"across {market_count} markets")
     return inserted_count
 
 
@@ -334,6 +382,19 @@ def main():
     """
     Main function to ingest all data into the database.
     """
+    # Parse command line arguments
+    parser = argparse.ArgumentParser(
+        description='Ingest collected Polymarket data into DuckDB',
+        formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    parser.add_argument(
+        '--bulk',
+        action='store_true',
+        help='Drop the price table indexes during ingest and rebuild them afterwards '
+             '(faster for large loads, slower for small incremental ones)'
+    )
+    args = parser.parse_args()
+    
     logger.info("🚀 Starting data ingestion...")
     
     # Check if database exists
@@ -347,10 +408,9 @@ def main():
         conn = duckdb.connect(DB_PATH)
         logger.info(f"✅ Connected to database at {DB_PATH}")
         
-        # Load JSON files
-        markets_data = load_json_file(MARKETS_FILE)
-        live_prices_data = load_json_file(LIVE_PRICES_FILE)
-        historical_data = load_json_file(HISTORICAL_PRICES_FILE)
+        # Load live prices (the markets snapshot is read by DuckDB directly,
+        # and historical prices are streamed during ingest)
+        live_prices_data = load_parquet_file(LIVE_PRICES_FILE)
         
         # Track summary stats
         summary = {
@@ -360,21 +420,46 @@ def main():
             'history_points_inserted': 0
         }
         
-        # Ingest markets
-        if markets_data:
-            inserted, updated = ingest_markets(conn, markets_data)
+        # Ingest everything in one transaction, so a failure part-way
+        # through leaves the database as it was
+        conn.begin()
+        try:
+            if args.bulk:
+                logger.info("Dropping price table indexes for bulk load...")
+                for index_name in PRICE_INDEXES:
+                    conn.execute(f"DROP INDEX IF EXISTS {index_name}")
+            
+            # Ingest markets
+            inserted, updated = ingest_markets(conn, MARKETS_FILE)
             summary['markets_inserted'] = inserted
             summary['markets_updated'] = updated
+            
+            # Ingest live prices
+            if live_prices_data:
+                inserted = ingest_live_prices(conn, live_prices_data)
+                summary['live_prices_inserted'] = inserted
+            
+            # Ingest historical prices
+            if os.path.exists(HISTORICAL_PRICES_FILE):
+                inserted = ingest_historical_prices(conn, iter_jsonl(HISTORICAL_PRICES_FILE))
+                summary['history_points_inserted'] = inserted
+            else:
+                logger.warning(f"File not found: {HISTORICAL_PRICES_FILE}")
+            
+            if args.bulk:
+                logger.info("Rebuilding price table indexes...")
+                for create_index in PRICE_INDEXES.values():
+                    conn.execute(create_index)
+            
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
         
-        # Ingest live prices
-        if live_prices_data:
-            inserted = ingest_live_prices(conn, live_prices_data)
-            summary['live_prices_inserted'] = inserted
-        
-        # Ingest historical prices
-        if historical_data:
-            inserted = ingest_historical_prices(conn, historical_data)
-            summary['history_points_inserted'] = inserted
+        # Refresh optimizer statistics and flush the WAL into the database
+        # file, so later queries plan on current data and open quickly
+        conn.execute("ANALYZE")
+        conn.execute("CHECKPOINT")
         
         # Close connection
         conn.close()
@@ -4,11 +4,33 @@ Centralized API client for interacting with Polymarket's Gamma and CLOB APIs.
 Includes rate limiting, retry logic, and proper error handling.
 """
 
+import asyncio
+import copy
 import logging
+import os
+import random
+import threading
 import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+import httpx
 import requests
-from typing import Optional, Dict, List, Any
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+from requests.adapters import HTTPAdapter
+from typing import Optional, Dict, List, Any, Callable
+from tenacity import AsyncRetrying, Retrying, wait_exponential, retry_if_exception, retry_if_exception_type
+from json_io import dumps, loads
+
+try:
+    import requests_cache
+except ImportError:
+    requests_cache = None
+
+try:
+    import websockets
+except ImportError:
+    websockets = None
 
 # Configure logging
 logging.basicConfig(
@@ -17,6 +39,209 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# Headers sent with every request by both clients
+DEFAULT_HEADERS = {
+    "Accept": "application/json",
+    "User-Agent": "polymarket-edge-finder",
+}
+
+# Throttling responses that are retried after the server's Retry-After delay
+THROTTLE_STATUS_CODES = (429, 503)
+MAX_RETRY_AFTER = 60  # Cap on a server-requested wait, in seconds
+MAX_ATTEMPTS = 3
+MAX_THROTTLED_ATTEMPTS = 5
+
+
+class RateLimitedError(Exception):
+    """Raised when the server answers 429 or 503; carries its Retry-After delay."""
+    
+    def __init__(self, url: str, status_code: int, retry_after: float):
+        super().__init__(f"HTTP {status_code} for {url}, retry after {retry_after:.1f}s")
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class TransientHTTPError(requests.exceptions.HTTPError):
+    """Raised by PolymarketClient for 5xx responses, which are worth retrying."""
+
+
+def parse_retry_after(value: Optional[str], default: float = 1.0) -> float:
+    """
+    Parse a Retry-After header given either as seconds or as an HTTP date.
+    
+    Args:
+        value: Header value, or None if the header was missing
+        default: Delay to use when the header is missing or malformed
+        
+    Returns:
+        Delay in seconds, between 0 and MAX_RETRY_AFTER
+    """
+    if not value:
+        return default
+    try:
+        delay = float(value)
+    except ValueError:
+        try:
+            delay = parsedate_to_datetime(value).timestamp() - time.time()
+        except (TypeError, ValueError):
+            return default
+    return min(max(delay, 0.0), MAX_RETRY_AFTER)
+
+
+def _stop_retrying(retry_state) -> bool:
+    """Give throttled requests more attempts than other failures."""
+    if isinstance(retry_state.outcome.exception(), RateLimitedError):
+        return retry_state.attempt_number >= MAX_THROTTLED_ATTEMPTS
+    return retry_state.attempt_number >= MAX_ATTEMPTS
+
+
+# Failures the fetch methods turn into a logged default value; anything else
+# is a bug and propagates
+REQUEST_ERRORS = (RateLimitedError, requests.exceptions.RequestException)
+ASYNC_REQUEST_ERRORS = (RateLimitedError, httpx.HTTPError)
+
+# Failures that may clear up on their own and are retried. Other 4xx
+# responses (bad token ID, malformed params) fail on the first attempt.
+RETRYABLE_ERRORS = (
+    RateLimitedError,
+    TransientHTTPError,
+    requests.exceptions.ConnectionError,
+    requests.exceptions.Timeout,
+    requests.exceptions.ChunkedEncodingError,
+    requests.exceptions.InvalidJSONError,
+)
+
+
+def _is_transient_async(exc: BaseException) -> bool:
+    """Async counterpart of RETRYABLE_ERRORS: throttling, transport errors, bad bodies and 5xx."""
+    if isinstance(exc, (RateLimitedError, httpx.TransportError, httpx.DecodingError)):
+        return True
+    return isinstance(exc, httpx.HTTPStatusError) and exc.response.status_code >= 500
+
+
+def request_key(url: str, params: Optional[Dict]) -> tuple:
+    """Hashable identity of a GET request, used to coalesce duplicates in flight."""
+    return (url, tuple(sorted(params.items())) if params else ())
+
+
+_backoff = wait_exponential(multiplier=1, min=2, max=10)
+
+
+def _wait_before_retry(retry_state) -> float:
+    """Wait as long as the server asked (plus jitter) when throttled, else back off exponentially."""
+    exc = retry_state.outcome.exception()
+    if isinstance(exc, RateLimitedError):
+        return exc.retry_after + random.uniform(0, 0.25)
+    return _backoff(retry_state)
+
+
+class TokenBucket:
+    """
+    Thread-safe token-bucket rate limiter.
+    
+    Holds at most `burst` tokens and refills one every `delay` seconds, so
+    up to `burst` requests go out immediately after an idle period and
+    sustained traffic is held to one request per `delay`. A delay of 0 or
+    less disables limiting.
+    """
+    
+    def __init__(self, delay: float, burst: int):
+        self.delay = delay
+        self.burst = burst
+        self._tokens = float(burst)
+        self._last_refill = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self):
+        """
+        Take a token, sleeping until one is available.
+        
+        Each caller takes its token under the lock, letting the count go
+        negative when the bucket is empty, and sleeps outside the lock until
+        its token would have been refilled.
+        """
+        if self.delay <= 0:
+            return
+        with self._lock:
+            now = time.monotonic()
+            refilled = self._tokens + (now - self._last_refill) / self.delay
+            self._tokens = min(self.burst, refilled) - 1
+            self._last_refill = now
+            wait = -self._tokens * self.delay
+        if wait > 0:
+            time.sleep(wait)
+    
+    def hold_off(self, seconds: float):
+        """Empty the bucket so that no caller gets a token for the next `seconds`."""
+        if self.delay <= 0:
+            return
+        with self._lock:
+            # Credit the time since the last refill first, so it can't be
+            # counted again against the hold-off by the next acquire(). The
+            # first token then becomes available exactly `seconds` from now
+            now = time.monotonic()
+            refilled = self._tokens + (now - self._last_refill) / self.delay
+            self._tokens = min(self.burst, refilled, 1 - seconds / self.delay)
+            self._last_refill = now
+
+
+@dataclass(slots=True)
+class Level:
+    """One orderbook price level, with price and size converted to floats."""
+    price: float
+    size: float
+
+
+@dataclass(slots=True)
+class Orderbook:
+    """
+    Orderbook with every level converted to floats once.
+    
+    Worth building when a caller scans the levels repeatedly; for a single
+    best bid/ask lookup, reading the raw dict is cheaper.
+    """
+    asset_id: Optional[str]
+    bids: List[Level]
+    asks: List[Level]
+    hash: str
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Orderbook":
+        """
+        Build an Orderbook from a CLOB /book response (or OrderbookStream book).
+        
+        Levels without a price or size are skipped; level order is kept.
+        
+        Args:
+            data: Orderbook dictionary with 'bids' and 'asks'
+            
+        Returns:
+            Orderbook instance
+        """
+        def levels(side: str) -> List[Level]:
+            return [
+                Level(float(level['price']), float(level['size']))
+                for level in data.get(side) or ()
+                if level.get('price') is not None and level.get('size') is not None
+            ]
+        
+        return cls(
+            asset_id=data.get('asset_id'),
+            bids=levels('bids'),
+            asks=levels('asks'),
+            hash=data.get('hash', ''),
+        )
+    
+    @property
+    def best_bid(self) -> Optional[float]:
+        """Highest bid price, or None if there are no bids."""
+        return max((level.price for level in self.bids), default=None)
+    
+    @property
+    def best_ask(self) -> Optional[float]:
+        """Lowest ask price, or None if there are no asks."""
+        return min((level.price for level in self.asks), default=None)
+
 
 class PolymarketClient:
     """
@@ -27,6 +252,7 @@ class PolymarketClient:
     - CLOB API: Orderbooks, prices, and live data
     
     Features:
+    - Pooled keep-alive connections via a shared requests.Session
     - Automatic retries with exponential backoff
     - Rate limiting to avoid throttling
     - Proper error handling
@@ -37,57 +263,243 @@ class PolymarketClient:
     GAMMA_API_BASE = "https://gamma-api.polymarket.com"
     CLOB_API_BASE = "https://clob.polymarket.com"
     
-    def __init__(self, rate_limit_delay: float = 0.5, timeout: int = 10):
+    # Endpoint URLs, built once rather than on every call
+    MARKETS_URL = f"{GAMMA_API_BASE}/markets"
+    BOOK_URL = f"{CLOB_API_BASE}/book"
+    BOOKS_URL = f"{CLOB_API_BASE}/books"
+    PRICE_URL = f"{CLOB_API_BASE}/price"
+    PRICES_URL = f"{CLOB_API_BASE}/prices"
+    MIDPOINT_URL = f"{CLOB_API_BASE}/midpoint"
+    MIDPOINTS_URL = f"{CLOB_API_BASE}/midpoints"
+    CLOB_MARKETS_URL = f"{CLOB_API_BASE}/markets"
+    PRICES_HISTORY_URL = f"{CLOB_API_BASE}/prices-history"
+    
+    # Entries per request to the CLOB batch endpoints (/books, /prices, /midpoints)
+    BATCH_SIZE = 100
+    
+    # Optional on-disk HTTP cache (requests-cache, SQLite backend). Gamma
+    # metadata changes rarely; CLOB prices and books are live and never cached.
+    # Cache-Control and ETag revalidation are honored when the server sends them.
+    HTTP_CACHE_FILE = "data/http_cache"
+    HTTP_CACHE_EXPIRE_AFTER = 300
+    HTTP_CACHE_URL_EXPIRE_AFTER = {
+        "gamma-api.polymarket.com/events/*": 86400,
+    }
+    
+    def __init__(self, rate_limit_delay: float = 0.5, timeout: int = 10, pool_maxsize: int = 32,
+                 burst: int = 5, cache: bool = False, rate_limits: Optional[Dict[str, tuple]] = None):
         """
         Initialize the Polymarket API client.
         
+        Each host (Gamma, CLOB) has its own rate-limit bucket, since the two
+        APIs are throttled independently by the server.
+        
         Args:
-            rate_limit_delay: Delay in seconds between requests (default: 0.5s)
+            rate_limit_delay: Sustained delay in seconds between requests to one host (default: 0.5s)
             timeout: Request timeout in seconds (default: 10s)
+            pool_maxsize: Connections kept open per host (default: 32)
+            burst: Requests that may go out back to back after an idle period (default: 5)
+            cache: Cache Gamma GET responses on disk (requires requests-cache, default: False)
+            rate_limits: Optional per-host overrides, mapping a host name such as
+                "clob.polymarket.com" to a (rate_limit_delay, burst) tuple
         """
         self.rate_limit_delay = rate_limit_delay
         self.timeout = timeout
-        self.last_request_time = 0
+        self.burst = burst
+        self.rate_limits = dict(rate_limits or {})
+        
+        # One token bucket per host, created on first use
+        self._buckets: Dict[str, TokenBucket] = {}
+        self._buckets_lock = threading.Lock()
+        
+        # GET requests currently on the wire, keyed by request_key(); each
+        # entry is [future, number of callers waiting on it]
+        self._inflight: Dict[tuple, list] = {}
+        self._inflight_lock = threading.Lock()
+        
+        # Built once and reused; each call gets its own retry state
+        self._retrying = Retrying(
+            stop=_stop_retrying,
+            wait=_wait_before_retry,
+            retry=retry_if_exception_type(RETRYABLE_ERRORS),
+            reraise=True
+        )
         
-    def _rate_limit(self):
-        """Apply rate limiting between requests."""
-        elapsed = time.time() - self.last_request_time
-        if elapsed < self.rate_limit_delay:
-            time.sleep(self.rate_limit_delay - elapsed)
-        self.last_request_time = time.time()
+        # Reuse TCP+TLS connections across requests (HTTP keep-alive).
+        # Retries stay with tenacity in _make_request, so the adapter doesn't retry.
+        self._cached = cache
+        self._session = self._create_session() if cache else requests.Session()
+        adapter = HTTPAdapter(pool_connections=2, pool_maxsize=pool_maxsize)
+        self._session.mount("https://", adapter)
+        self._session.headers.update(DEFAULT_HEADERS)
     
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=2, max=10),
-        retry=retry_if_exception_type((requests.exceptions.RequestException, requests.exceptions.Timeout)),
-        reraise=True
-    )
-    def _make_request(self, url: str, params: Optional[Dict] = None) -> Dict[str, Any]:
+    def _create_session(self) -> requests.Session:
         """
-        Make an HTTP GET request with retry logic and error handling.
+        Create a requests-cache CachedSession backed by HTTP_CACHE_FILE.
+        
+        Raises:
+            ImportError: If requests-cache is not installed
+        """
+        if requests_cache is None:
+            raise ImportError("requests-cache is required for PolymarketClient(cache=True)")
+        os.makedirs(os.path.dirname(self.HTTP_CACHE_FILE), exist_ok=True)
+        return requests_cache.CachedSession(
+            self.HTTP_CACHE_FILE,
+            backend="sqlite",
+            expire_after=self.HTTP_CACHE_EXPIRE_AFTER,
+            urls_expire_after={
+                **self.HTTP_CACHE_URL_EXPIRE_AFTER,
+                "clob.polymarket.com/*": requests_cache.DO_NOT_CACHE,
+            },
+            allowable_methods=("GET",),
+            cache_control=True,
+        )
+    
+    def close(self):
+        """Close the session and release its pooled connections."""
+        self._session.close()
+    
+    def __enter__(self) -> "PolymarketClient":
+        return self
+    
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+        
+    def _bucket(self, url: str) -> TokenBucket:
+        """Return the rate-limit bucket for the URL's host, creating it on first use."""
+        host = urlsplit(url).netloc
+        bucket = self._buckets.get(host)
+        if bucket is None:
+            with self._buckets_lock:
+                bucket = self._buckets.get(host)
+                if bucket is None:
+                    delay, burst = self.rate_limits.get(host, (self.rate_limit_delay, self.burst))
+                    bucket = self._buckets[host] = TokenBucket(delay, burst)
+        return bucket
+    
+    def _rate_limit(self, url: str):
+        """
+        Apply token-bucket rate limiting before a request to the URL's host.
+        
+        Up to `burst` requests go out immediately after an idle period;
+        sustained traffic is held to one request per rate_limit_delay.
+        Safe to call from several threads.
+        """
+        self._bucket(url).acquire()
+    
+    def _hold_off(self, url: str, seconds: float):
+        """
+        Empty the URL host's rate-limit bucket so that no request from any
+        thread goes there for the next `seconds`, e.g. after the server
+        asked us to back off.
+        """
+        self._bucket(url).hold_off(seconds)
+    
+    def _make_request(self, url: str, params: Optional[Dict] = None, payload: Any = None) -> Dict[str, Any]:
+        """
+        Make an HTTP request with retry logic and error handling.
+        
+        Sends a GET with query parameters, or a POST with a JSON body when
+        payload is given.
+        
+        Identical GETs made from several threads at once are coalesced: the
+        first caller sends the request and the others wait for its result,
+        so they share one rate-limit slot. Every caller that shared a request
+        gets its own deep copy of the response, so callers may mutate it.
         
         Args:
             url: The URL to request
             params: Optional query parameters
+            payload: Optional JSON body; switches the request to POST
             
         Returns:
             JSON response as dictionary
             
         Raises:
+            RateLimitedError: If the server is still throttling after retries
             requests.exceptions.RequestException: On request failures after retries
         """
-        self._rate_limit()
+        if payload is not None:
+            return self._retrying(self._send, url, params, payload)
+        
+        key = request_key(url, params)
+        with self._inflight_lock:
+            entry = self._inflight.get(key)
+            leader = entry is None
+            if leader:
+                entry = self._inflight[key] = [Future(), 0]
+            else:
+                entry[1] += 1
+        future = entry[0]
+        if not leader:
+            # The shared response stays untouched; each follower copies it
+            return copy.deepcopy(future.result())
         
         try:
-            logger.debug(f"Making request to: {url} with params: {params}")
-            response = requests.get(url, params=params, timeout=self.timeout)
+            result = self._retrying(self._send, url, params)
+        except BaseException as e:
+            with self._inflight_lock:
+                del self._inflight[key]
+            future.set_exception(e)
+            raise
+        # Once the entry is gone no one else can join, so the follower count is final
+        with self._inflight_lock:
+            del self._inflight[key]
+            shared = entry[1] > 0
+        future.set_result(result)
+        return copy.deepcopy(result) if shared else result
+    
+    def _send(self, url: str, params: Optional[Dict] = None, payload: Any = None) -> Dict[str, Any]:
+        """
+        Send one HTTP request (a single attempt); see _make_request.
+        
+        Args:
+            url: The URL to request
+            params: Optional query parameters
+            payload: Optional JSON body; switches the request to POST
+            
+        Returns:
+            JSON response as dictionary
+            
+        Raises:
+            RateLimitedError: If the server is still throttling after retries
+            requests.exceptions.RequestException: On request failures after retries
+        """
+        try:
+            logger.debug("Making request to: %s with params: %s", url, params)
+            response = None
+            if payload is None and self._cached:
+                # A fresh cached response is served without spending a rate-limit
+                # token. On a miss, requests-cache answers only_if_cached with a
+                # synthetic 504 (only 200s are ever stored)
+                response = self._session.get(url, params=params, timeout=self.timeout, only_if_cached=True)
+                if response.status_code == 504:
+                    response = None
+            
+            if response is None:
+                self._rate_limit(url)
+                if payload is None:
+                    response = self._session.get(url, params=params, timeout=self.timeout)
+                else:
+                    response = self._session.post(url, json=payload, timeout=self.timeout)
+            if response.status_code in THROTTLE_STATUS_CODES:
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                logger.warning(f"Throttled with HTTP {response.status_code} for {url}, retrying in {retry_after:.1f}s")
+                self._hold_off(url, retry_after)
+                raise RateLimitedError(url, response.status_code, retry_after)
+            if response.status_code >= 500:
+                raise TransientHTTPError(f"{response.status_code} Server Error for url: {url}", response=response)
             response.raise_for_status()
             
             try:
-                return response.json()
+                # Parse the raw bytes with orjson (when installed) rather than
+                # response.json(), which decodes to str and uses the stdlib parser
+                return loads(response.content)
             except ValueError as e:
                 logger.error(f"Failed to parse JSON response from {url}: {e}")
-                raise
+                # Raised as a RequestException so a truncated body is retried,
+                # as it was with response.json()
+                raise requests.exceptions.InvalidJSONError(str(e), response=response) from e
                 
         except requests.exceptions.HTTPError as e:
             logger.error(f"HTTP error for {url}: {e}")
@@ -102,9 +514,32 @@ class PolymarketClient:
             logger.error(f"Request error for {url}: {e}")
             raise
     
+    def _safe(self, default: Any, request, message: str, *args, level: int = logging.WARNING) -> Any:
+        """
+        Run a request, turning a request failure into a logged default value.
+        
+        Only REQUEST_ERRORS are caught, so programming errors still surface.
+        
+        Args:
+            default: Value returned when the request fails
+            request: Callable performing the request
+            message: What was being fetched, as a %-style template for the log
+            *args: Arguments for the message template
+            level: Log level for the failure (default: WARNING)
+            
+        Returns:
+            The request's result, or default on failure
+        """
+        try:
+            return request()
+        except REQUEST_ERRORS as e:
+            logger.log(level, "Error fetching " + message + ": %s", *args, e)
+            return default
+    
     # Gamma API Methods
     
-    def get_markets(self, limit: int = 100, offset: int = 0, closed: Optional[bool] = None) -> List[Dict[str, Any]]:
+    def get_markets(self, limit: int = 100, offset: int = 0, closed: Optional[bool] = None,
+                    active: Optional[bool] = None, archived: Optional[bool] = None) -> List[Dict[str, Any]]:
         """
         Fetch markets from the Gamma API.
         
@@ -112,31 +547,68 @@ class PolymarketClient:
             limit: Number of markets to fetch (default: 100, max: 100)
             offset: Offset for pagination (default: 0)
             closed: Filter by closed status (None = all, True = closed only, False = active only)
+            active: Filter by active flag (None = no filter)
+            archived: Filter by archived flag (None = no filter)
             
         Returns:
             List of market dictionaries
         """
-        url = f"{self.GAMMA_API_BASE}/markets"
+        url = self.MARKETS_URL
         params = {"limit": limit, "offset": offset}
         
-        if closed is not None:
-            params["closed"] = "true" if closed else "false"
+        # Let the server drop unwanted markets so they never cross the wire
+        for name, value in (("closed", closed), ("active", active), ("archived", archived)):
+            if value is not None:
+                params[name] = "true" if value else "false"
         
-        logger.info(f"Fetching markets: limit={limit}, offset={offset}, closed={closed}")
+        logger.info(f"Fetching markets: limit={limit}, offset={offset}, closed={closed}, "
+                    f"active={active}, archived={archived}")
         
-        try:
-            data = self._make_request(url, params)
-            # The API returns a list directly
-            if isinstance(data, list):
-                return data
-            # Or it might be wrapped in a 'data' field
-            elif isinstance(data, dict) and 'data' in data:
-                return data['data']
-            else:
-                return data if data else []
-        except Exception as e:
-            logger.error(f"Error fetching markets: {e}")
-            return []
+        data = self._safe([], lambda: self._make_request(url, params), "markets", level=logging.ERROR)
+        # The API returns a list directly
+        if isinstance(data, list):
+            return data
+        # Or it might be wrapped in a 'data' field
+        elif isinstance(data, dict) and 'data' in data:
+            return data['data']
+        else:
+            return data if data else []
+    
+    def get_all_markets(self, page_size: int = 100, max_workers: int = 8, closed: Optional[bool] = None,
+                        active: Optional[bool] = None, archived: Optional[bool] = None) -> List[Dict[str, Any]]:
+        """
+        Fetch every market from the Gamma API, requesting pages concurrently.
+        
+        The total count isn't known up front, so pages are requested in
+        rounds of max_workers consecutive offsets. Pagination ends at the
+        first page that comes back short (or empty on error); pages fetched
+        past it in the same round are discarded. The rate limiter is shared
+        by all workers, so concurrency overlaps round trips without raising
+        the request rate.
+        
+        Args:
+            page_size: Markets per request (default: 100, max: 100)
+            max_workers: Pages requested at once (default: 8)
+            closed: Filter by closed status (None = no filter)
+            active: Filter by active flag (None = no filter)
+            archived: Filter by archived flag (None = no filter)
+            
+        Returns:
+            List of market dictionaries in offset order
+        """
+        def fetch_page(offset: int) -> List[Dict[str, Any]]:
+            return self.get_markets(page_size, offset, closed=closed, active=active, archived=archived)
+        
+        markets = []
+        offset = 0
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while True:
+                round_offsets = range(offset, offset + page_size * max_workers, page_size)
+                for page in executor.map(fetch_page, round_offsets):
+                    markets.extend(page)
+                    if len(page) < page_size:
+                        return markets
+                offset += page_size * max_workers
     
     def get_event(self, event_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -151,11 +623,7 @@ class PolymarketClient:
         url = f"{self.GAMMA_API_BASE}/events/{event_id}"
         logger.info(f"Fetching event: {event_id}")
         
-        try:
-            return self._make_request(url)
-        except Exception as e:
-            logger.error(f"Error fetching event {event_id}: {e}")
-            return None
+        return self._safe(None, lambda: self._make_request(url), "event %s", event_id, level=logging.ERROR)
     
     # CLOB API Methods
     
@@ -169,15 +637,11 @@ class PolymarketClient:
         Returns:
             Orderbook dictionary with 'bids' and 'asks' or None on error
         """
-        url = f"{self.CLOB_API_BASE}/book"
+        url = self.BOOK_URL
         params = {"token_id": token_id}
-        logger.debug(f"Fetching orderbook for token: {token_id}")
+        logger.debug("Fetching orderbook for token: %s", token_id)
         
-        try:
-            return self._make_request(url, params)
-        except Exception as e:
-            logger.warning(f"Error fetching orderbook for token {token_id}: {e}")
-            return None
+        return self._safe(None, lambda: self._make_request(url, params), "orderbook for token %s", token_id)
     
     def get_price(self, token_id: str, side: str = "buy") -> Optional[Dict[str, Any]]:
         """
@@ -190,15 +654,11 @@ class PolymarketClient:
         Returns:
             Price data dictionary or None on error
         """
-        url = f"{self.CLOB_API_BASE}/price"
+        url = self.PRICE_URL
         params = {"token_id": token_id, "side": side}
-        logger.debug(f"Fetching price for token: {token_id}, side: {side}")
+        logger.debug("Fetching price for token: %s, side: %s", token_id, side)
         
-        try:
-            return self._make_request(url, params)
-        except Exception as e:
-            logger.warning(f"Error fetching price for token {token_id}: {e}")
-            return None
+        return self._safe(None, lambda: self._make_request(url, params), "price for token %s", token_id)
     
     def get_midpoint(self, token_id: str) -> Optional[Dict[str, Any]]:
         """
@@ -210,15 +670,119 @@ class PolymarketClient:
         Returns:
             Midpoint data dictionary or None on error
         """
-        url = f"{self.CLOB_API_BASE}/midpoint"
+        url = self.MIDPOINT_URL
         params = {"token_id": token_id}
-        logger.debug(f"Fetching midpoint for token: {token_id}")
+        logger.debug("Fetching midpoint for token: %s", token_id)
         
-        try:
-            return self._make_request(url, params)
-        except Exception as e:
-            logger.warning(f"Error fetching midpoint for token {token_id}: {e}")
-            return None
+        return self._safe(None, lambda: self._make_request(url, params), "midpoint for token %s", token_id)
+    
+    def _post_batches(self, url: str, entries: List[Dict[str, Any]], what: str) -> List[Any]:
+        """
+        POST entries to a CLOB batch endpoint, BATCH_SIZE entries per request.
+        
+        Args:
+            url: Batch endpoint URL
+            entries: Request body entries, e.g. {"token_id": ...}
+            what: Name of the data being fetched, for log messages
+            
+        Returns:
+            Parsed responses of the chunks that succeeded
+        """
+        responses = []
+        for i in range(0, len(entries), self.BATCH_SIZE):
+            chunk = entries[i:i + self.BATCH_SIZE]
+            try:
+                responses.append(self._make_request(url, payload=chunk))
+            except REQUEST_ERRORS as e:
+                logger.warning(f"Error fetching {what} batch of {len(chunk)} tokens: {e}")
+        return responses
+    
+    def get_orderbooks(self, token_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Fetch orderbooks for many tokens with the CLOB /books batch endpoint.
+        
+        Args:
+            token_ids: Token IDs to fetch
+            
+        Returns:
+            Dictionary mapping token ID to orderbook; tokens whose batch
+            failed or that the API did not return are missing
+        """
+        url = self.BOOKS_URL
+        logger.debug("Fetching orderbooks for %d tokens", len(token_ids))
+        
+        books = {}
+        for chunk_books in self._post_batches(url, [{"token_id": t} for t in token_ids], "orderbook"):
+            for book in chunk_books:
+                books[book.get('asset_id')] = book
+        return books
+    
+    def map_orderbooks(self, token_ids: List[str], max_workers: int = 16) -> Dict[str, Dict[str, Any]]:
+        """
+        Fetch orderbooks one token at a time on a thread pool sharing this session.
+        
+        Prefer get_orderbooks, which needs one request per BATCH_SIZE
+        tokens; this is for callers that need the per-token /book endpoint.
+        Requests still pass through the shared rate limiter.
+        
+        Args:
+            token_ids: Token IDs to fetch
+            max_workers: Requests in flight at once (default: 16); keep it
+                at or below pool_maxsize so connections are reused
+            
+        Returns:
+            Dictionary mapping token ID to orderbook, in completion order;
+            tokens whose request failed are missing
+        """
+        books = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(self.get_orderbook, token_id): token_id for token_id in token_ids}
+            for future in as_completed(futures):
+                book = future.result()
+                if book is not None:
+                    books[futures[future]] = book
+        return books
+    
+    def get_prices(self, pairs: List[tuple]) -> Dict[str, Dict[str, Any]]:
+        """
+        Fetch current prices for many tokens with the CLOB /prices batch endpoint.
+        
+        Args:
+            pairs: (token_id, side) tuples, side being 'buy' or 'sell'
+            
+        Returns:
+            Dictionary mapping token ID to its prices keyed by side, as
+            returned by the API; tokens whose batch failed are missing
+        """
+        url = self.PRICES_URL
+        logger.debug("Fetching prices for %d token/side pairs", len(pairs))
+        
+        entries = [{"token_id": token_id, "side": side.upper()} for token_id, side in pairs]
+        prices = {}
+        for chunk_prices in self._post_batches(url, entries, "price"):
+            for token_id, token_prices in chunk_prices.items():
+                # A token requested for both sides may come back in two chunks
+                prices.setdefault(token_id, {}).update(token_prices)
+        return prices
+    
+    def get_midpoints(self, token_ids: List[str]) -> Dict[str, Any]:
+        """
+        Fetch midpoint prices for many tokens with the CLOB /midpoints batch endpoint.
+        
+        Args:
+            token_ids: Token IDs to fetch
+            
+        Returns:
+            Dictionary mapping token ID to midpoint, as returned by the API;
+            tokens whose batch failed are missing
+        """
+        url = self.MIDPOINTS_URL
+        logger.debug("Fetching midpoints for %d tokens", len(token_ids))
+        
+        midpoints = {}
+        for chunk_midpoints in self._post_batches(url, [{"token_id": t} for t in token_ids], "midpoint"):
+            midpoints.update(chunk_midpoints)
+        return midpoints
     
     def get_clob_markets(self) -> List[Dict[str, Any]]:
         """
@@ -227,19 +791,15 @@ class PolymarketClient:
         Returns:
             List of market dictionaries
         """
-        url = f"{self.CLOB_API_BASE}/markets"
+        url = self.CLOB_MARKETS_URL
         logger.info("Fetching CLOB markets")
         
-        try:
-            data = self._make_request(url)
-            if isinstance(data, list):
-                return data
-            elif isinstance(data, dict) and 'data' in data:
-                return data['data']
-            else:
-                return []
-        except Exception as e:
-            logger.error(f"Error fetching CLOB markets: {e}")
+        data = self._safe([], lambda: self._make_request(url), "CLOB markets", level=logging.ERROR)
+        if isinstance(data, list):
+            return data
+        elif isinstance(data, dict) and 'data' in data:
+            return data['data']
+        else:
             return []
     
     def get_prices_history(self, token_id: str, interval: str = "max", fidelity: int = 60) -> Optional[Dict[str, Any]]:
@@ -254,13 +814,452 @@ class PolymarketClient:
         Returns:
             Price history dictionary or None on error
         """
-        url = f"{self.CLOB_API_BASE}/prices-history"
+        url = self.PRICES_HISTORY_URL
         # Note: The API expects 'market' as the parameter name, even though we pass a token_id value
         params = {"market": token_id, "interval": interval, "fidelity": fidelity}
-        logger.debug(f"Fetching price history for token: {token_id}")
+        logger.debug("Fetching price history for token: %s", token_id)
         
+        return self._safe(None, lambda: self._make_request(url, params), "price history for token %s", token_id)
+    
+    def get_prices_history_arrays(self, token_id: str, interval: str = "max",
+                                  fidelity: int = 60) -> Optional[tuple]:
+        """
+        Fetch historical prices for a token as NumPy arrays.
+        
+        Decodes the history once into two flat arrays, which take a fraction
+        of the memory of the per-point dicts and feed straight into
+        vectorized analysis.
+        
+        Args:
+            token_id: The token ID
+            interval: Time interval ('max' for all available data)
+            fidelity: Data point frequency in seconds (default: 60 = 1 minute)
+            
+        Returns:
+            Tuple of (timestamps, prices): int64 Unix seconds and float64
+            prices, or None on error
+        """
+        # Imported here so the scripts that never need arrays don't pay for numpy
+        import numpy as np
+        
+        data = self.get_prices_history(token_id, interval, fidelity)
+        if data is None:
+            return None
+        history = data.get('history') or []
+        timestamps = np.fromiter((point['t'] for point in history), dtype=np.int64, count=len(history))
+        prices = np.fromiter((point['p'] for point in history), dtype=np.float64, count=len(history))
+        return timestamps, prices
+
+
+
+class AsyncPolymarketClient:
+    """
+    Async client for issuing many CLOB API requests concurrently.
+    
+    Use as an async context manager so the underlying connection pool is
+    opened once and closed when the batch is done:
+    
+        async with AsyncPolymarketClient(max_concurrency=20) as client:
+            books = await asyncio.gather(*(client.get_orderbook(t) for t in token_ids))
+    
+    Features:
+    - Concurrency bounded by a semaphore instead of sleeping between requests
+    - Automatic retries with exponential backoff
+    - A single shared HTTP/2 connection pool for the whole batch
+    """
+    
+    CLOB_API_BASE = PolymarketClient.CLOB_API_BASE
+    BOOK_URL = PolymarketClient.BOOK_URL
+    BOOKS_URL = PolymarketClient.BOOKS_URL
+    PRICE_URL = PolymarketClient.PRICE_URL
+    MIDPOINT_URL = PolymarketClient.MIDPOINT_URL
+    BOOKS_BATCH_SIZE = 100  # Token IDs per /books request
+    
+    def __init__(self, max_concurrency: int = 20, timeout: int = 10):
+        """
+        Initialize the async Polymarket API client.
+        
+        Args:
+            max_concurrency: Maximum number of requests in flight at once (default: 20)
+            timeout: Request timeout in seconds (default: 10s)
+        """
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        # GET requests currently on the wire, keyed by request_key(); each
+        # entry is [task, number of callers waiting on it]
+        self._inflight: Dict[tuple, list] = {}
+        # Built once and reused; each call gets its own retry state
+        self._retrying = AsyncRetrying(
+            stop=_stop_retrying,
+            wait=_wait_before_retry,
+            retry=retry_if_exception(_is_transient_async),
+            reraise=True
+        )
+    
+    async def __aenter__(self) -> "AsyncPolymarketClient":
+        # HTTP/2 multiplexes concurrent requests over one TLS connection per host
+        self._client = httpx.AsyncClient(
+            http2=True,
+            headers=DEFAULT_HEADERS,
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=self.max_concurrency)
+        )
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self._client.aclose()
+        self._client = None
+    
+    async def _make_request(self, url: str, params: Optional[Dict] = None, payload: Any = None) -> Any:
+        """
+        Make an HTTP request with retry logic, bounded by the concurrency limit.
+        
+        Sends a GET with query parameters, or a POST with a JSON body when
+        payload is given.
+        
+        Identical GETs awaited at the same time are coalesced into one
+        request. Every caller that shared a request gets its own deep copy
+        of the response, so callers may mutate it. Cancelling one caller
+        does not cancel the shared request.
+        
+        Args:
+            url: The URL to request
+            params: Optional query parameters
+            payload: Optional JSON body; switches the request to POST
+            
+        Returns:
+            Parsed JSON response
+            
+        Raises:
+            RateLimitedError: If the server is still throttling after retries
+            httpx.HTTPError: On request failures after retries
+        """
+        if payload is not None:
+            return await self._retrying(self._send, url, params, payload)
+        
+        # All callers share one event loop, so the dict needs no lock
+        key = request_key(url, params)
+        entry = self._inflight.get(key)
+        if entry is not None:
+            # The shared response stays untouched; each follower copies it
+            entry[1] += 1
+            return copy.deepcopy(await asyncio.shield(entry[0]))
+        
+        task = asyncio.ensure_future(self._retrying(self._send, url, params))
+        entry = self._inflight[key] = [task, 0]
+        
+        def release(_=None):
+            if self._inflight.get(key) is entry:
+                del self._inflight[key]
+        
+        # Also released when the task ends, in case this caller is cancelled
+        task.add_done_callback(release)
+        result = await asyncio.shield(task)
+        # Released before reading the count (no await in between), so no one can join after
+        release()
+        return copy.deepcopy(result) if entry[1] else result
+    
+    async def _send(self, url: str, params: Optional[Dict] = None, payload: Any = None) -> Any:
+        """
+        Send one HTTP request (a single attempt) under the semaphore; see _make_request.
+        
+        Args:
+            url: The URL to request
+            params: Optional query parameters
+            payload: Optional JSON body; switches the request to POST
+            
+        Returns:
+            Parsed JSON response
+            
+        Raises:
+            RateLimitedError: If the server is still throttling after retries
+            httpx.HTTPError: On request failures after retries
+        """
+        async with self._semaphore:
+            logger.debug("Making async request to: %s with params: %s", url, params)
+            if payload is None:
+                response = await self._client.get(url, params=params)
+            else:
+                response = await self._client.post(url, json=payload)
+            if response.status_code in THROTTLE_STATUS_CODES:
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                logger.warning(f"Throttled with HTTP {response.status_code} for {url}, retrying in {retry_after:.1f}s")
+                raise RateLimitedError(url, response.status_code, retry_after)
+            response.raise_for_status()
+            try:
+                return loads(response.content)
+            except ValueError as e:
+                # Raised as an httpx error so a truncated body is retried
+                raise httpx.DecodingError(f"Failed to parse JSON response from {url}: {e}",
+                                          request=response.request) from e
+    
+    async def _safe(self, default: Any, request, message: str, *args) -> Any:
+        """
+        Await a request, turning a request failure into a logged default value.
+        
+        Only ASYNC_REQUEST_ERRORS are caught, so programming errors still surface.
+        
+        Args:
+            default: Value returned when the request fails
+            request: Awaitable performing the request
+            message: What was being fetched, as a %-style template for the log
+            *args: Arguments for the message template
+            
+        Returns:
+            The request's result, or default on failure
+        """
+        try:
+            return await request
+        except ASYNC_REQUEST_ERRORS as e:
+            logger.warning("Error fetching " + message + ": %s", *args, e)
+            return default
+    
+    async def get_orderbook(self, token_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Fetch orderbook for a token from the CLOB API.
+        
+        Args:
+            token_id: The token ID (YES or NO token)
+            
+        Returns:
+            Orderbook dictionary with 'bids' and 'asks' or None on error
+        """
+        params = {"token_id": token_id}
+        
+        return await self._safe(None, self._make_request(self.BOOK_URL, params), "orderbook for token %s", token_id)
+    
+    async def get_orderbooks(self, token_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Fetch orderbooks for many tokens using the CLOB batch endpoint.
+        
+        Token IDs are sent in chunks of BOOKS_BATCH_SIZE, one POST /books
+        request per chunk, with the chunks issued concurrently.
+        
+        Args:
+            token_ids: Token IDs to fetch
+            
+        Returns:
+            Dictionary mapping token ID to orderbook; tokens whose chunk
+            failed or that the API did not return are missing
+        """
+        chunks = [
+            token_ids[i:i + self.BOOKS_BATCH_SIZE]
+            for i in range(0, len(token_ids), self.BOOKS_BATCH_SIZE)
+        ]
+        logger.debug("Fetching %d orderbooks in %d batches", len(token_ids), len(chunks))
+        
+        async def fetch_chunk(chunk: List[str]) -> List[Dict[str, Any]]:
+            payload = [{"token_id": token_id} for token_id in chunk]
+            return await self._safe(
+                [], self._make_request(self.BOOKS_URL, payload=payload), "orderbook batch of %d tokens", len(chunk)
+            )
+        
+        books = {}
+        for chunk_books in await asyncio.gather(*(fetch_chunk(chunk) for chunk in chunks)):
+            for book in chunk_books:
+                books[book.get('asset_id')] = book
+        return books
+    
+    async def get_price(self, token_id: str, side: str = "buy") -> Optional[Dict[str, Any]]:
+        """
+        Fetch current price for a token from the CLOB API.
+        
+        Args:
+            token_id: The token ID
+            side: 'buy' or 'sell'
+            
+        Returns:
+            Price data dictionary or None on error
+        """
+        params = {"token_id": token_id, "side": side}
+        
+        return await self._safe(None, self._make_request(self.PRICE_URL, params), "price for token %s", token_id)
+    
+    async def get_midpoint(self, token_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Fetch midpoint price for a token from the CLOB API.
+        
+        Args:
+            token_id: The token ID
+            
+        Returns:
+            Midpoint data dictionary or None on error
+        """
+        params = {"token_id": token_id}
+        
+        return await self._safe(None, self._make_request(self.MIDPOINT_URL, params), "midpoint for token %s", token_id)
+    
+    async def get_prices(self, token_ids: List[str], side: str = "buy") -> Dict[str, Dict[str, Any]]:
+        """
+        Fetch current prices for many tokens concurrently.
+        
+        One request per token, all issued at once; the semaphore keeps at
+        most max_concurrency in flight.
+        
+        Args:
+            token_ids: Token IDs to fetch
+            side: 'buy' or 'sell'
+            
+        Returns:
+            Dictionary mapping token ID to price data; failed tokens are missing
+        """
+        results = await asyncio.gather(*(self.get_price(token_id, side) for token_id in token_ids))
+        return {token_id: price for token_id, price in zip(token_ids, results) if price is not None}
+    
+    async def get_midpoints(self, token_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """
+        Fetch midpoint prices for many tokens concurrently.
+        
+        One request per token, all issued at once; the semaphore keeps at
+        most max_concurrency in flight.
+        
+        Args:
+            token_ids: Token IDs to fetch
+            
+        Returns:
+            Dictionary mapping token ID to midpoint data; failed tokens are missing
+        """
+        results = await asyncio.gather(*(self.get_midpoint(token_id) for token_id in token_ids))
+        return {token_id: midpoint for token_id, midpoint in zip(token_ids, results) if midpoint is not None}
+
+
+class OrderbookStream:
+    """
+    Live orderbooks for a set of tokens, kept current from the CLOB market
+    WebSocket instead of polling the REST /book endpoint.
+    
+    Run it as an async context manager; a background task holds the
+    subscription open and reconnects with exponential backoff:
+    
+        async with OrderbookStream(token_ids) as stream:
+            ...
+            book = stream.get_orderbook(token_id)
+    
+    The server sends a full 'book' snapshot for every token on subscribe
+    (and again after each reconnect), then 'price_change' deltas, which are
+    applied to the cached levels. Requires the websockets package.
+    """
+    
+    WS_URL = "wss://ws-subscriptions-clob.polymarket.com/ws/market"
+    MAX_BACKOFF = 30  # Longest wait between reconnect attempts, in seconds
+    
+    def __init__(self, token_ids: List[str], on_update: Optional[Callable[[str], None]] = None):
+        """
+        Initialize the stream.
+        
+        Args:
+            token_ids: Token IDs to subscribe to
+            on_update: Optional callback, called with the token ID after each
+                change to that token's book
+        """
+        if websockets is None:
+            raise ImportError("websockets is required for OrderbookStream")
+        self.token_ids = list(token_ids)
+        self.on_update = on_update
+        # token ID -> {'bids': {price: size}, 'asks': {price: size}}, prices and sizes as sent
+        self._books: Dict[str, Dict[str, Dict[str, str]]] = {}
+        self._task: Optional[asyncio.Task] = None
+    
+    async def __aenter__(self) -> "OrderbookStream":
+        self._task = asyncio.create_task(self._run())
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+    
+    async def _run(self):
+        """Hold the subscription open, reconnecting with exponential backoff."""
+        subscribe = dumps({"assets_ids": self.token_ids, "type": "market"}).decode()
+        delay = 1
+        while True:
+            try:
+                async with websockets.connect(self.WS_URL) as ws:
+                    await ws.send(subscribe)
+                    delay = 1
+                    async for message in ws:
+                        try:
+                            self._handle(loads(message))
+                        except Exception:
+                            # One bad message must not end the stream and leave every book stale
+                            logger.exception("Failed to apply orderbook stream message: %.200s", message)
+            except (OSError, websockets.WebSocketException) as e:
+                logger.warning("Orderbook stream disconnected: %s; reconnecting in %ds", e, delay)
+            except Exception:
+                logger.exception("Orderbook stream failed; reconnecting in %ds", delay)
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.MAX_BACKOFF)
+    
+    def _handle(self, message: Any):
+        """
+        Apply one WebSocket message (a single event or a list of events).
+        
+        Args:
+            message: Parsed message from the market channel
+        """
+        for event in message if isinstance(message, list) else (message,):
+            if not isinstance(event, dict):
+                continue
+            event_type = event.get('event_type')
+            if event_type == 'book':
+                token_id = event.get('asset_id')
+                self._books[token_id] = {
+                    'bids': {level['price']: level['size'] for level in event.get('bids', [])},
+                    'asks': {level['price']: level['size'] for level in event.get('asks', [])},
+                }
+                self._notify(token_id)
+            elif event_type == 'price_change':
+                # Changes carry their own asset_id in the current message
+                # format; older messages put it on the event
+                for change in event.get('price_changes') or event.get('changes', []):
+                    token_id = change.get('asset_id', event.get('asset_id'))
+                    book = self._books.get(token_id)
+                    if book is None:
+                        # No snapshot yet; the 'book' event will bring the level
+                        continue
+                    levels = book['bids' if change.get('side') == 'BUY' else 'asks']
+                    price = change.get('price')
+                    if float(change.get('size', 0)) == 0:
+                        levels.pop(price, None)
+                    else:
+                        levels[price] = change['size']
+                    self._notify(token_id)
+    
+    def _notify(self, token_id: str):
+        if self.on_update is None:
+            return
         try:
-            return self._make_request(url, params)
-        except Exception as e:
-            logger.warning(f"Error fetching price history for token {token_id}: {e}")
+            self.on_update(token_id)
+        except Exception:
+            # A failing callback must not stop the stream from applying updates
+            logger.exception("on_update callback failed for token %s", token_id)
+    
+    def get_orderbook(self, token_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Return the cached orderbook for a token in the REST /book shape.
+        
+        Bids are sorted by ascending price and asks by descending price, so
+        the best level of each side is last, as in REST responses.
+        
+        Args:
+            token_id: The token ID (YES or NO token)
+            
+        Returns:
+            Orderbook dictionary with 'bids' and 'asks', or None if no
+            snapshot has arrived for the token yet
+        """
+        book = self._books.get(token_id)
+        if book is None:
             return None
+        return {
+            'asset_id': token_id,
+            'bids': [{'price': p, 'size': book['bids'][p]} for p in sorted(book['bids'], key=float)],
+            'asks': [{'price': p, 'size': book['asks'][p]} for p in sorted(book['asks'], key=float, reverse=True)],
+        }
@@ -0,0 +1,23 @@
+"""
+Shared pytest setup.
+
+The pipeline scripts live in scripts/ and import each other as top-level
+modules (e.g. `from json_io import dumps`), so that directory goes on
+sys.path. Numbered scripts such as 05_ingest_data.py aren't valid module
+names and are loaded with load_script().
+"""
+
+import importlib.util
+import os
+import sys
+
+SCRIPTS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'scripts')
+sys.path.insert(0, SCRIPTS_DIR)
+
+
+def load_script(filename, module_name):
+    """Import a script from scripts/ by file name under the given module name."""
+    spec = importlib.util.spec_from_file_location(module_name, os.path.join(SCRIPTS_DIR, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
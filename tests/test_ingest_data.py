@@ -0,0 +1,133 @@
+"""
+Round-trip tests for 05_ingest_data.py against an in-memory DuckDB database
+built with the schema from 04_setup_database.py.
+"""
+
+import duckdb
+import pytest
+
+from conftest import load_script
+from json_io import write_jsonl
+
+setup_db = load_script('04_setup_database.py', 'setup_database')
+ingest = load_script('05_ingest_data.py', 'ingest_data')
+
+
+@pytest.fixture
+def conn(tmp_path, monkeypatch):
+    """In-memory copy of a freshly set-up database."""
+    db_path = str(tmp_path / 'data' / 'schema.duckdb')
+    monkeypatch.setattr(setup_db, 'DB_PATH', db_path)
+    assert setup_db.setup_database()
+    
+    conn = duckdb.connect(':memory:')
+    conn.execute(f"ATTACH '{db_path}' AS schema_db (READ_ONLY)")
+    conn.execute("COPY FROM DATABASE schema_db TO memory")
+    conn.execute("DETACH schema_db")
+    yield conn
+    conn.close()
+
+
+def market(market_id, question, **fields):
+    return {
+        'market_id': market_id,
+        'question': question,
+        'outcomes': ['Yes', 'No'],
+        'yes_token_id': f'{market_id}-yes',
+        'no_token_id': f'{market_id}-no',
+        'tags': ['politics'],
+        'volume': '1000',
+        **fields,
+    }
+
+
+def history(market_id, yes_points, no_points=()):
+    return {
+        'market_id': market_id,
+        'question': f'Question {market_id}?',
+        'yes_token_id': f'{market_id}-yes',
+        'no_token_id': f'{market_id}-no',
+        'yes_history': {'history': list(yes_points)},
+        'no_history': {'history': list(no_points)},
+    }
+
+
+def test_ingest_markets_inserts_then_updates(conn, tmp_path):
+    markets_file = str(tmp_path / 'markets.jsonl')
+    write_jsonl(markets_file, [market('m1', 'First?'), market('m2', 'Second?')])
+    
+    assert ingest.ingest_markets(conn, markets_file) == (2, 0)
+    
+    # m1 is updated in place, m3 is new
+    write_jsonl(markets_file, [market('m1', 'First, renamed?', volume='2500'), market('m3', 'Third?')])
+    
+    assert ingest.ingest_markets(conn, markets_file) == (1, 1)
+    rows = conn.execute("SELECT market_id, question, volume FROM markets ORDER BY market_id").fetchall()
+    assert rows == [('m1', 'First, renamed?', 2500.0), ('m2', 'Second?', 1000.0), ('m3', 'Third?', 1000.0)]
+
+
+def test_ingest_markets_keeps_last_duplicate_and_skips_missing_ids(conn, tmp_path):
+    markets_file = str(tmp_path / 'markets.jsonl')
+    write_jsonl(markets_file, [
+        market('m1', 'Old?'),
+        market('', 'No id?'),
+        market('m1', 'New?'),
+    ])
+    
+    assert ingest.ingest_markets(conn, markets_file) == (1, 0)
+    assert conn.execute("SELECT market_id, question FROM markets").fetchall() == [('m1', 'New?')]
+
+
+def test_ingest_markets_missing_file(conn, tmp_path):
+    assert ingest.ingest_markets(conn, str(tmp_path / 'missing.jsonl')) == (0, 0)
+
+
+def test_ingest_historical_prices_skips_duplicates(conn):
+    records = [
+        history('m1', [{'t': 100, 'p': 0.6}, {'t': 160, 'p': 0.62}], [{'t': 100, 'p': 0.4}]),
+        history('m2', [{'t': 100, 'p': 0.1}]),
+    ]
+    
+    assert ingest.ingest_historical_prices(conn, records) == 4
+    # Re-ingesting the same points inserts nothing; one new point is added
+    records[1]['yes_history']['history'].append({'t': 160, 'p': 0.15})
+    assert ingest.ingest_historical_prices(conn, records) == 1
+    assert conn.execute("SELECT count(*) FROM price_history").fetchone()[0] == 5
+
+
+def test_ingest_historical_prices_dedupes_within_a_batch(conn, monkeypatch):
+    # Force several small batches so a duplicate lands in a later one too
+    monkeypatch.setattr(ingest, 'HISTORY_BATCH_ROWS', 2)
+    records = [
+        history('m1', [{'t': 100, 'p': 0.6}, {'t': 100, 'p': 0.6}]),
+        history('m1', [{'t': 100, 'p': 0.6}, {'t': 160, 'p': 0.7}]),
+    ]
+    
+    assert ingest.ingest_historical_prices(conn, records) == 2
+
+
+def test_ingest_historical_prices_coerces_and_skips_bad_points(conn):
+    records = [history('m1', [
+        {'t': 100, 'p': '0.6'},
+        {'t': '160', 'p': 0.7},
+        {'t': 220, 'p': 'n/a'},
+        {'t': 280, 'p': None},
+        {'t': 340, 'p': [0.8]},
+    ])]
+    
+    assert ingest.ingest_historical_prices(conn, records) == 2
+    prices = conn.execute("SELECT price FROM price_history ORDER BY timestamp").fetchall()
+    assert prices == [(0.6,), (0.7,)]
+
+
+def test_ingest_historical_prices_empty(conn):
+    assert ingest.ingest_historical_prices(conn, iter([None, {}])) == 0
+
+
+def test_ingest_historical_prices_converts_unix_seconds_to_utc(conn):
+    # 1700000000.5 is 2023-11-14 22:13:20.5 UTC, whatever the local timezone
+    records = [history('m1', [{'t': 1700000000.5, 'p': 0.6}], [{'t': 0, 'p': 0.4}])]
+    
+    assert ingest.ingest_historical_prices(conn, records) == 2
+    rows = conn.execute("SELECT side, CAST(timestamp AS VARCHAR) FROM price_history ORDER BY side").fetchall()
+    assert rows == [('NO', '1970-01-01 00:00:00'), ('YES', '2023-11-14 22:13:20.5')]
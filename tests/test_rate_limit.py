@@ -0,0 +1,119 @@
+"""
+Tests for the per-host TokenBucket rate limiter, run against a fake clock.
+"""
+
+import pytest
+
+import api_client
+from api_client import PolymarketClient, TokenBucket
+
+
+class FakeClock:
+    """Stands in for the time module: sleep() advances monotonic() instantly."""
+    
+    def __init__(self):
+        self.now = 1000.0
+        self.sleeps = []
+    
+    def monotonic(self):
+        return self.now
+    
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+    
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(api_client, 'time', clock)
+    return clock
+
+
+def test_burst_then_sustained_rate(clock):
+    bucket = TokenBucket(delay=0.5, burst=3)
+    
+    for _ in range(3):
+        bucket.acquire()
+    assert clock.sleeps == []
+    
+    bucket.acquire()
+    assert clock.sleeps == [pytest.approx(0.5)]
+
+
+def test_idle_time_refills_up_to_burst(clock):
+    bucket = TokenBucket(delay=0.5, burst=2)
+    bucket.acquire()
+    bucket.acquire()
+    
+    clock.now += 60
+    bucket.acquire()
+    bucket.acquire()
+    assert clock.sleeps == []
+    bucket.acquire()
+    assert clock.sleeps == [pytest.approx(0.5)]
+
+
+def test_hold_off_blocks_the_next_token(clock):
+    bucket = TokenBucket(delay=0.5, burst=5)
+    
+    bucket.hold_off(3.0)
+    bucket.acquire()
+    assert clock.sleeps == [pytest.approx(3.0)]
+    # Back to the sustained rate afterwards
+    bucket.acquire()
+    assert clock.sleeps[1] == pytest.approx(0.5)
+
+
+def test_hold_off_is_not_shortened_by_earlier_idle_time(clock):
+    bucket = TokenBucket(delay=0.5, burst=5)
+    bucket.acquire()
+    
+    # Idle time before the hold-off must not be credited after it
+    clock.now += 10
+    bucket.hold_off(2.0)
+    bucket.acquire()
+    assert clock.sleeps == [pytest.approx(2.0)]
+
+
+def test_hold_off_never_adds_tokens(clock):
+    bucket = TokenBucket(delay=0.5, burst=5)
+    for _ in range(5):
+        bucket.acquire()
+    bucket.acquire()
+    assert clock.sleeps == [pytest.approx(0.5)]
+    
+    # A hold-off shorter than the current wait leaves the wait alone
+    bucket.hold_off(0.1)
+    bucket.acquire()
+    assert clock.sleeps[1] == pytest.approx(0.5)
+
+
+def test_zero_delay_disables_limiting(clock):
+    bucket = TokenBucket(delay=0, burst=1)
+    bucket.hold_off(30)
+    for _ in range(10):
+        bucket.acquire()
+    assert clock.sleeps == []
+
+
+def test_hosts_have_separate_buckets(clock):
+    client = PolymarketClient(rate_limit_delay=0.5, burst=1,
+                              rate_limits={'clob.polymarket.com': (0.1, 2)})
+    
+    gamma = client._bucket(client.MARKETS_URL)
+    clob = client._bucket(client.BOOK_URL)
+    assert gamma is client._bucket(client.MARKETS_URL + '?limit=1')
+    assert (gamma.delay, gamma.burst) == (0.5, 1)
+    assert (clob.delay, clob.burst) == (0.1, 2)
+    
+    # Throttling on Gamma doesn't hold back CLOB requests
+    client._hold_off(client.MARKETS_URL, 5.0)
+    client._rate_limit(client.BOOK_URL)
+    assert clock.sleeps == []
+    client._rate_limit(client.MARKETS_URL)
+    assert clock.sleeps == [pytest.approx(5.0)]
+    client.close()
@@ -0,0 +1,154 @@
+"""
+Tests for coalescing of identical in-flight GET requests in
+PolymarketClient._make_request and AsyncPolymarketClient._make_request.
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from api_client import AsyncPolymarketClient, PolymarketClient, request_key
+
+URL = PolymarketClient.BOOK_URL
+PARAMS = {'token_id': '123'}
+CALLERS = 5
+
+
+def wait_for_followers(inflight, key, count, timeout=5.0):
+    """Block until `count` callers are waiting on the request for `key`."""
+    deadline = time.monotonic() + timeout
+    while inflight[key][1] < count:
+        assert time.monotonic() < deadline, "followers never joined the request"
+        time.sleep(0.001)
+
+
+@pytest.fixture
+def client():
+    with PolymarketClient(rate_limit_delay=0) as client:
+        yield client
+
+
+def test_request_key_ignores_param_order():
+    assert request_key(URL, {'a': 1, 'b': 2}) == request_key(URL, {'b': 2, 'a': 1})
+    assert request_key(URL, None) == request_key(URL, {})
+    assert request_key(URL, {'a': 1}) != request_key(URL, {'a': 2})
+
+
+def test_concurrent_identical_gets_share_one_request(client, monkeypatch):
+    calls = []
+    
+    def send(url, params=None, payload=None):
+        calls.append((url, params))
+        wait_for_followers(client._inflight, request_key(url, params), CALLERS - 1)
+        return {'bids': [{'price': '0.5', 'size': '10'}]}
+    
+    monkeypatch.setattr(client, '_send', send)
+    with ThreadPoolExecutor(CALLERS) as pool:
+        results = list(pool.map(lambda _: client._make_request(URL, PARAMS), range(CALLERS)))
+    
+    assert calls == [(URL, PARAMS)]
+    assert all(result == {'bids': [{'price': '0.5', 'size': '10'}]} for result in results)
+    # Every caller gets its own copy, down to the nested levels
+    assert len({id(result) for result in results}) == CALLERS
+    assert len({id(result['bids'][0]) for result in results}) == CALLERS
+    results[0]['bids'].clear()
+    assert all(result['bids'] for result in results[1:])
+    assert client._inflight == {}
+
+
+def test_sequential_gets_are_not_coalesced(client, monkeypatch):
+    calls = []
+    
+    def send(url, params=None, payload=None):
+        calls.append(params)
+        return {'n': len(calls)}
+    
+    monkeypatch.setattr(client, '_send', send)
+    
+    assert client._make_request(URL, PARAMS) == {'n': 1}
+    assert client._make_request(URL, PARAMS) == {'n': 2}
+
+
+def test_posts_are_not_coalesced(client, monkeypatch):
+    calls = []
+    release = threading.Event()
+    
+    def send(url, params=None, payload=None):
+        calls.append(payload)
+        release.wait(5)
+        return {}
+    
+    monkeypatch.setattr(client, '_send', send)
+    with ThreadPoolExecutor(2) as pool:
+        futures = [pool.submit(client._make_request, URL, None, [{'token_id': '1'}]) for _ in range(2)]
+        while len(calls) < 2:
+            time.sleep(0.001)
+        release.set()
+        for future in futures:
+            future.result()
+    
+    assert len(calls) == 2
+
+
+def test_failed_request_raises_in_every_caller(client, monkeypatch):
+    def send(url, params=None, payload=None):
+        wait_for_followers(client._inflight, request_key(url, params), CALLERS - 1)
+        raise ValueError("boom")
+    
+    monkeypatch.setattr(client, '_send', send)
+    with ThreadPoolExecutor(CALLERS) as pool:
+        futures = [pool.submit(client._make_request, URL, PARAMS) for _ in range(CALLERS)]
+        for future in futures:
+            with pytest.raises(ValueError, match="boom"):
+                future.result()
+    
+    assert client._inflight == {}
+
+
+def test_async_identical_gets_share_one_request(monkeypatch):
+    client = AsyncPolymarketClient()
+    calls = []
+    
+    async def send(url, params=None, payload=None):
+        calls.append(params)
+        await asyncio.sleep(0.01)
+        return {'asks': [{'price': '0.6', 'size': '5'}]}
+    
+    monkeypatch.setattr(client, '_send', send)
+    
+    async def run():
+        return await asyncio.gather(*(client._make_request(URL, PARAMS) for _ in range(CALLERS)))
+    
+    results = asyncio.run(run())
+    
+    assert calls == [PARAMS]
+    assert all(result == {'asks': [{'price': '0.6', 'size': '5'}]} for result in results)
+    assert len({id(result['asks']) for result in results}) == CALLERS
+    assert client._inflight == {}
+
+
+def test_async_cancelled_leader_does_not_cancel_followers(monkeypatch):
+    client = AsyncPolymarketClient()
+    
+    async def send(url, params=None, payload=None):
+        await asyncio.sleep(0.02)
+        return {'ok': True}
+    
+    monkeypatch.setattr(client, '_send', send)
+    
+    async def run():
+        leader = asyncio.ensure_future(client._make_request(URL, PARAMS))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(client._make_request(URL, PARAMS))
+        await asyncio.sleep(0)
+        leader.cancel()
+        result = await follower
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return result
+    
+    assert asyncio.run(run()) == {'ok': True}
+    assert client._inflight == {}
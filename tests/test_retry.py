@@ -0,0 +1,131 @@
+"""
+Tests for the retry policy: Retry-After parsing, the stop condition, and
+which responses PolymarketClient._make_request retries.
+"""
+
+import time
+from email.utils import formatdate
+from types import SimpleNamespace
+
+import pytest
+import requests
+
+import api_client
+from api_client import (
+    MAX_ATTEMPTS, MAX_RETRY_AFTER, MAX_THROTTLED_ATTEMPTS,
+    PolymarketClient, RateLimitedError, TransientHTTPError,
+    _stop_retrying, parse_retry_after,
+)
+
+URL = PolymarketClient.BOOK_URL
+
+
+@pytest.mark.parametrize('value, expected', [
+    (None, 1.0),
+    ('', 1.0),
+    ('5', 5.0),
+    ('2.5', 2.5),
+    ('-3', 0.0),
+    ('3600', MAX_RETRY_AFTER),
+    ('soon', 1.0),
+])
+def test_parse_retry_after(value, expected):
+    assert parse_retry_after(value) == expected
+
+
+def test_parse_retry_after_default():
+    assert parse_retry_after(None, default=4.0) == 4.0
+    assert parse_retry_after('not a date', default=4.0) == 4.0
+
+
+def test_parse_retry_after_http_date():
+    assert parse_retry_after(formatdate(time.time() + 30, usegmt=True)) == pytest.approx(30, abs=2)
+    assert parse_retry_after(formatdate(time.time() - 30, usegmt=True)) == 0.0
+
+
+def retry_state(exc, attempt_number):
+    return SimpleNamespace(outcome=SimpleNamespace(exception=lambda: exc), attempt_number=attempt_number)
+
+
+def test_stop_retrying_gives_throttled_requests_more_attempts():
+    throttled = RateLimitedError(URL, 429, 1.0)
+    failed = TransientHTTPError("500 Server Error")
+    
+    assert not _stop_retrying(retry_state(throttled, MAX_THROTTLED_ATTEMPTS - 1))
+    assert _stop_retrying(retry_state(throttled, MAX_THROTTLED_ATTEMPTS))
+    assert not _stop_retrying(retry_state(failed, MAX_ATTEMPTS - 1))
+    assert _stop_retrying(retry_state(failed, MAX_ATTEMPTS))
+
+
+def make_response(status_code, body=b'{}', headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = body
+    response.headers.update(headers or {})
+    response.url = URL
+    return response
+
+
+class FakeSession:
+    """Returns the queued responses in order and records each GET."""
+    
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.calls = 0
+    
+    def get(self, url, params=None, timeout=None):
+        self.calls += 1
+        return self.responses.pop(0)
+    
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def client():
+    client = PolymarketClient(rate_limit_delay=0)
+    # Record the waits instead of sleeping through them
+    client.waits = []
+    client._retrying = client._retrying.copy(sleep=client.waits.append)
+    yield client
+    client.close()
+
+
+def test_client_error_fails_on_first_attempt(client):
+    client._session = FakeSession(make_response(404), make_response(200))
+    
+    with pytest.raises(requests.exceptions.HTTPError) as excinfo:
+        client._make_request(URL, {'token_id': 'bad'})
+    assert not isinstance(excinfo.value, TransientHTTPError)
+    assert client._session.calls == 1
+
+
+def test_server_error_is_retried(client):
+    client._session = FakeSession(make_response(502), make_response(500), make_response(200, b'{"ok": true}'))
+    
+    assert client._make_request(URL, {'token_id': '1'}) == {'ok': True}
+    assert client._session.calls == 3
+    assert len(client.waits) == 2
+
+
+def test_server_error_gives_up_after_max_attempts(client):
+    client._session = FakeSession(*(make_response(500) for _ in range(MAX_ATTEMPTS + 1)))
+    
+    with pytest.raises(TransientHTTPError):
+        client._make_request(URL, {'token_id': '1'})
+    assert client._session.calls == MAX_ATTEMPTS
+
+
+def test_throttled_request_waits_for_retry_after(client, monkeypatch):
+    monkeypatch.setattr(api_client.random, 'uniform', lambda a, b: 0.0)
+    client._session = FakeSession(make_response(429, headers={'Retry-After': '7'}), make_response(200, b'[]'))
+    
+    assert client._make_request(URL, {'token_id': '1'}) == []
+    assert client.waits == [7.0]
+
+
+def test_truncated_body_is_retried(client):
+    client._session = FakeSession(make_response(200, b'{"ok": tr'), make_response(200, b'{"ok": true}'))
+    
+    assert client._make_request(URL, {'token_id': '1'}) == {'ok': True}
+    assert client._session.calls == 2